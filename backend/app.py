@@ -1,10 +1,15 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import logging
+import threading
 import time
 
-from config import APP_NAME, APP_VERSION, DEBUG, ALLOWED_HOSTS, API_HOST, DEPLOYMENT_MODE, LOGS_DIR
+from config import APP_NAME, APP_VERSION, DEBUG, ALLOWED_HOSTS, API_HOST, DEPLOYMENT_MODE, LOGS_DIR, ANALYSIS_WARMUP
 from core.isolation_validator import IsolationValidator
+from core.database import init_db, db_manager
+from core.detection_engine import detection_content_version
+from services.storage_service import StorageService
 from routes import logs, analysis, soup, health
 
 # Configure logging to both file and console
@@ -76,6 +81,14 @@ async def startup_validation():
     logger.info(f"🌐 API Host: {API_HOST}")
     logger.info("=" * 70)
     
+    # Open DuckDB and create the schema once for the whole process
+    init_db()
+    logger.info("🗄️ Database connection ready")
+    
+    # Rows stored by older versions are migrated while the API already serves requests
+    app.state.migration_stop = threading.Event()
+    app.state.migration_task = asyncio.create_task(migrate_stored_logs(app.state.migration_stop))
+    
     # Run isolation validation
     validator = IsolationValidator()
     report = validator.validate_isolation()
@@ -100,6 +113,44 @@ async def startup_validation():
         logger.warning("=" * 70)
     
     logger.info("✅ Startup validation complete")
+    
+    if ANALYSIS_WARMUP:
+        # Models load in the analysis workers while the API already serves requests
+        app.state.warmup_task = asyncio.create_task(warm_up_analysis())
+
+
+async def migrate_stored_logs(stop: threading.Event):
+    """One-off migrations of stored rows (e.g. native content hashes for pre-upgrade logs)"""
+    try:
+        await asyncio.to_thread(StorageService.backfill_content_hashes, stop=stop)
+    except Exception as e:
+        # Retried on the next start; until then legacy rows are not deduplicated against
+        logger.error(f"❌ Stored log migration failed: {e}")
+
+
+async def warm_up_analysis():
+    """Start the analysis workers with the current detection content"""
+    try:
+        version = await asyncio.to_thread(detection_content_version)
+        analysis.analysis_executor.use_version(version)
+        await analysis.analysis_executor.warm_up()
+    except Exception as e:
+        # e.g. missing model files; the first analysis job reports the error again.
+        # warm_up() already dropped its pool unless a job is using it
+        logger.warning(f"⚠️ Analysis warm-up failed: {e}")
+
+
+@app.on_event("shutdown")
+async def shutdown_database():
+    """Stop analysis and ingest workers and migrations, then flush and close the process-wide DuckDB connection"""
+    analysis.analysis_executor.shutdown()
+    logs.ingest_service.shutdown()
+    migration_task = getattr(app.state, "migration_task", None)
+    if migration_task is not None:
+        # The migration stops after its current batch and resumes on the next start
+        app.state.migration_stop.set()
+        await migration_task
+    db_manager.close()
 
 
 @app.get("/")
@@ -25,6 +25,32 @@ if not ENCRYPTION_KEY:
 
 SOUP_SIGNING_KEY = os.getenv("SOUP_SIGNING_KEY")
 
+# Ingest settings
+# Bytes of a log file read and parsed per step (bounds parser memory for large files)
+PARSE_CHUNK_BYTES = int(os.getenv("PARSE_CHUNK_BYTES", str(32 * 1024 * 1024)))
+# Worker processes parsing files in parallel during ingest (0 = CPU count - 1)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0"))
+# Field mapping for JSON logs: auto, default, ecs, windows or docker (see services/parser_service.py)
+JSON_MAPPING_PROFILE = os.getenv("JSON_MAPPING_PROFILE", "auto")
+# Column mapping for CSV logs: auto, default, firewall, proxy or loghub
+CSV_MAPPING_PROFILE = os.getenv("CSV_MAPPING_PROFILE", "auto")
+# Column types inferred per CSV header, reused by later imports of the same source type
+CSV_SCHEMA_DIR = DATA_DIR / "csv_schemas"
+
+# Detection settings
+# Maximum number of messages pushed through the AI models as one matrix
+AI_BATCH_SIZE = int(os.getenv("AI_BATCH_SIZE", "2048"))
+# Entries in the template-keyed anomaly verdict cache (0 disables it)
+TEMPLATE_CACHE_SIZE = int(os.getenv("TEMPLATE_CACHE_SIZE", "50000"))
+# Stored logs read, scored and written back per analysis step (bounds job memory)
+ANALYSIS_CHUNK_SIZE = int(os.getenv("ANALYSIS_CHUNK_SIZE", "5000"))
+# Worker processes scoring analysis chunks, each with its own copy of the models (0 = CPU count - 1)
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "0"))
+# Start the analysis workers (and load their models) in the background at startup
+ANALYSIS_WARMUP = os.getenv("ANALYSIS_WARMUP", "true").lower() == "true"
+# Also store a sha256 digest of each raw line (audit only; dedup uses the native hash)
+CONTENT_HASH_AUDIT = os.getenv("CONTENT_HASH_AUDIT", "false").lower() == "true"
+
 # APP Settings
 APP_NAME = "Project Quorum"
 APP_VERSION = "1.0.0"
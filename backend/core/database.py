@@ -1,18 +1,59 @@
 import duckdb
 import os
+import threading
+from contextlib import contextmanager
 from config import DB_PATH
 
-def get_db_collection():
-    """
-    Initialize DuckDB with complete schema.
-    If the PYTEST_RUNNING environment variable is set, it uses an in-memory database.
-    """
-    db_path = ":memory:" if os.getenv("PYTEST_RUNNING") else str(DB_PATH)
-    conn = duckdb.connect(db_path)
+# Columns added after the original schema, created on existing databases at startup
+MIGRATED_COLUMNS = {
+    'content_hash_hi': 'UBIGINT',
+    'content_hash_lo': 'UBIGINT',
+    'attributes': 'TEXT',
+    'event_id': 'BIGINT',
+}
+
+INDEXES = {
+    'idx_timestamp': "CREATE INDEX IF NOT EXISTS idx_timestamp ON logs(timestamp);",
+    'idx_anomaly': "CREATE INDEX IF NOT EXISTS idx_anomaly ON logs(is_anomaly);",
+    'idx_host': "CREATE INDEX IF NOT EXISTS idx_host ON logs(host);",
+    'idx_content_hash_native': (
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_content_hash_native "
+        "ON logs(content_hash_hi, content_hash_lo);"
+    ),
+}
+
+
+def _add_missing_columns(conn):
+    """Bring an existing logs table up to the current schema"""
+    existing = {
+        row[0] for row in conn.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = 'logs'"
+        ).fetchall()
+    }
+    missing = {name: sql_type for name, sql_type in MIGRATED_COLUMNS.items() if name not in existing}
+    if not missing:
+        return
+
+    # Older DuckDB releases refuse to ALTER a table that has indexes; they are recreated below
+    for index_name in list(INDEXES) + ['idx_content_hash']:
+        conn.execute(f"DROP INDEX IF EXISTS {index_name};")
+    for name, sql_type in missing.items():
+        conn.execute(f"ALTER TABLE logs ADD COLUMN IF NOT EXISTS {name} {sql_type};")
+
+
+def _create_schema(conn):
+    """Create tables and indexes (runs once per process)"""
+    # Row ids come from a sequence and double as the monotonic ingest sequence used by
+    # incremental analysis; for a pre-existing table it starts after the current max id
+    table_exists = conn.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'logs'"
+    ).fetchone()[0]
+    next_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM logs").fetchone()[0] if table_exists else 1
+    conn.execute(f"CREATE SEQUENCE IF NOT EXISTS logs_id_seq START {int(next_id)};")
 
     conn.execute("""
         CREATE TABLE IF NOT EXISTS logs (
-            id INTEGER PRIMARY KEY,
+            id INTEGER PRIMARY KEY DEFAULT nextval('logs_id_seq'),
             timestamp TIMESTAMP,
             host VARCHAR,
             process VARCHAR,
@@ -25,16 +66,95 @@ def get_db_collection():
             severity VARCHAR DEFAULT 'low',
             detections TEXT,
             ttp_tags TEXT,
-            content_hash VARCHAR
+            content_hash VARCHAR,
+            content_hash_hi UBIGINT,
+            content_hash_lo UBIGINT,
+            attributes TEXT,
+            event_id BIGINT
+        );
+    """)
+    _add_missing_columns(conn)
+
+    # Dedup now keys on the native 128-bit hash pair; the sha256 column is audit-only
+    conn.execute("DROP INDEX IF EXISTS idx_content_hash;")
+
+    # Incremental analysis: highest logs.id scored per analysis scope and detection content
+    # version. It advances with every written chunk, so it is also the crash-resume point
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS analysis_watermarks (
+            scope VARCHAR,
+            detection_version VARCHAR,
+            last_seq BIGINT,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (scope, detection_version)
         );
     """)
 
     # Create indexes for performance
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_timestamp ON logs(timestamp);")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_anomaly ON logs(is_anomaly);")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_host ON logs(host);")
-    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_content_hash ON logs(content_hash);")
+    for create_index in INDEXES.values():
+        conn.execute(create_index)
 
-    return conn
+
+class ConnectionManager:
+    """
+    Process-wide DuckDB connection manager.
+    The database is opened and the schema created once; reads get a cheap
+    cursor on the shared database and writes go through a single long-lived
+    writer cursor serialized by a lock.
+    If the PYTEST_RUNNING environment variable is set, it uses an in-memory database.
+    """
+
+    def __init__(self):
+        self._conn = None
+        self._writer = None
+        self._init_lock = threading.Lock()
+        self.write_lock = threading.RLock()
+
+    def connect(self):
+        """Open the database and set up the schema on first use"""
+        if self._conn is None:
+            with self._init_lock:
+                if self._conn is None:
+                    db_path = ":memory:" if os.getenv("PYTEST_RUNNING") else str(DB_PATH)
+                    conn = duckdb.connect(db_path)
+                    _create_schema(conn)
+                    self._writer = conn.cursor()
+                    self._conn = conn
+        return self._conn
+
+    def cursor(self):
+        """New read cursor sharing the process-wide database instance"""
+        conn = self.connect()
+        with self._init_lock:
+            return conn.cursor()
+
+    @contextmanager
+    def writer(self):
+        """The single writer cursor, held exclusively for the duration of the block"""
+        self.connect()
+        with self.write_lock:
+            yield self._writer
+
+    def close(self):
+        with self._init_lock:
+            if self._conn is not None:
+                self._writer.close()
+                self._conn.close()
+                self._conn = None
+                self._writer = None
 
 
+db_manager = ConnectionManager()
+
+
+def init_db():
+    """Open the database and create the schema (call once at startup)"""
+    db_manager.connect()
+
+
+def get_db_collection():
+    """
+    Read cursor on the shared DuckDB database.
+    Kept for existing callers; the schema is only created on first use.
+    """
+    return db_manager.cursor()
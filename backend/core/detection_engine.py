@@ -6,20 +6,51 @@ Multi-layered detection engine combining:
 - Threat intelligence matching (offline IoC database)
 """
 
+import hashlib
 import json
 import re
 from pathlib import Path
 from typing import List, Dict, Any
 from datetime import datetime
-from config import DATA_DIR
+from config import DATA_DIR, MODELS_DIR, TEMPLATE_CACHE_SIZE
 from functools import lru_cache
 from services.ai_engine import AIEngine
+from core.keyword_automaton import KeywordAutomaton
+from core.ttp_matcher import TTPMatcher
+from core.ioc_index import IoCIndex
+from core.template_miner import TemplateMiner, TemplateMatch, LRUCache
+
+
+def detection_content_version() -> str:
+    """
+    Short hash of everything that decides detection results: rules, MITRE TTP
+    patterns, threat intel and model files. It changes whenever a SOUP update
+    replaces any of them, which starts a new incremental-analysis watermark.
+    """
+    sources = sorted((DATA_DIR / "rules").glob("*.json"))
+    sources += [DATA_DIR / "mitre_attack" / "ttp_patterns.json", DATA_DIR / "threat_intel" / "indicators.json"]
+    if MODELS_DIR.exists():
+        sources += sorted(path for path in MODELS_DIR.iterdir() if path.is_file())
+    
+    digest = hashlib.sha256()
+    for path in sources:
+        if not path.is_file():
+            continue
+        digest.update(path.name.encode())
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    
+    return digest.hexdigest()[:16]
 
 
 class DetectionEngine:
     """Unified detection engine for Project Quorum"""
     
     def __init__(self):
+        # Version of the rule / intel / model content loaded below
+        self.content_version = detection_content_version()
+        
         # Load AI engine
         self.ai_engine = AIEngine()
         
@@ -28,19 +59,20 @@ class DetectionEngine:
         
         # Load detection rules (Sigma-like format)
         self.rules = self._load_rules()
+        self.rule_automaton, self.rule_process_index = self._compile_rules(self.rules)
         
         # MITRE ATT&CK TTP mapping
         self.ttp_patterns = self._load_ttp_patterns()
-        self._tfidf_cache = {}  # Cache vectorized messages
+        self.ttp_matcher = TTPMatcher(self.ttp_patterns)
+        
+        # Log template mining + result cache for repeated templates
+        self.template_miner = TemplateMiner()
+        self.result_cache = LRUCache(TEMPLATE_CACHE_SIZE)
     
-    def _load_threat_intel(self) -> Dict[str, List[str]]:
-        """Load offline threat intelligence database"""
+    def _load_threat_intel(self) -> IoCIndex:
+        """Load offline threat intelligence database into an indexed IoC store"""
         intel_file = DATA_DIR / "threat_intel" / "indicators.json"
-        if not intel_file.exists():
-            return {"ips": [], "domains": [], "hashes": [], "processes": []}
-        
-        with open(intel_file, 'r') as f:
-            return json.load(f)
+        return IoCIndex.load(intel_file)
     
     def _load_rules(self) -> List[Dict]:
         """Load detection rules (simplified Sigma format)"""
@@ -54,6 +86,23 @@ class DetectionEngine:
         
         return rules
     
+    def _compile_rules(self, rules: List[Dict]):
+        """
+        Compile rule keywords into a single automaton keyed by rule index,
+        plus an exact-match index for process-name rules
+        """
+        keywords = []
+        process_index = {}
+        
+        for idx, rule in enumerate(rules):
+            detection = rule.get('detection', {})
+            for keyword in detection.get('keywords', []):
+                keywords.append((keyword, idx))
+            if 'process' in detection:
+                process_index.setdefault(detection['process'], set()).add(idx)
+        
+        return KeywordAutomaton.from_keywords(keywords), process_index
+    
     def _load_ttp_patterns(self) -> Dict[str, Dict]:
         """Load MITRE ATT&CK TTP detection patterns"""
         ttp_file = DATA_DIR / "mitre_attack" / "ttp_patterns.json"
@@ -63,10 +112,13 @@ class DetectionEngine:
         with open(ttp_file, 'r') as f:
             return json.load(f)
     
-    def analyze_log(self, log_entry: Dict[str, Any]) -> Dict[str, Any]:
+    def analyze_log(self, log_entry: Dict[str, Any], anomaly_result: Dict = None) -> Dict[str, Any]:
         """
         Comprehensive log analysis using all detection methods
         
+        anomaly_result may carry a precomputed AI verdict (see batch_analyze);
+        otherwise the message is scored on its own.
+        
         Returns:
         {
             'is_threat': bool,
@@ -85,7 +137,8 @@ class DetectionEngine:
         max_severity = 'low'
         
         # 1. Anomaly Detection (AI)
-        anomaly_result = self._detect_anomaly(log_entry['message'])
+        if anomaly_result is None:
+            anomaly_result = self._detect_anomaly(log_entry['message'])
         if anomaly_result['is_anomaly']:
             detections.append({
                 'type': 'anomaly',
@@ -143,52 +196,46 @@ class DetectionEngine:
         """Rule-based detection (Sigma-like)"""
         matches = []
         
-        for rule in self.rules:
-            if self._rule_matches(rule, log_entry):
-                matches.append({
-                    'type': 'rule',
-                    'name': rule['title'],
-                    'score': 1.0,
-                    'severity': rule.get('level', 'medium'),
-                    'details': {
-                        'rule_id': rule.get('id'),
-                        'description': rule.get('description'),
-                        'tags': rule.get('tags', [])
-                    }
-                })
+        for idx in sorted(self._matching_rule_indices(log_entry)):
+            rule = self.rules[idx]
+            matches.append({
+                'type': 'rule',
+                'name': rule['title'],
+                'score': 1.0,
+                'severity': rule.get('level', 'medium'),
+                'details': {
+                    'rule_id': rule.get('id'),
+                    'description': rule.get('description'),
+                    'tags': rule.get('tags', [])
+                }
+            })
         
         return matches
     
-    def _rule_matches(self, rule: Dict, log_entry: Dict) -> bool:
-        """Check if a rule matches a log entry"""
-        detection = rule.get('detection', {})
-        
-        # Simple keyword matching (can be extended)
-        keywords = detection.get('keywords', [])
-        message = log_entry.get('message', '').lower()
-        
-        for keyword in keywords:
-            if keyword.lower() in message:
-                return True
+    def _matching_rule_indices(self, log_entry: Dict) -> set:
+        """Indices of every rule matching a log entry, in one pass over the message"""
+        # Keyword matching (case-insensitive substring, via the compiled automaton)
+        hits = self.rule_automaton.search(log_entry.get('message') or '')
         
         # Process name matching
-        if 'process' in detection:
-            if log_entry.get('process') == detection['process']:
-                return True
+        process = log_entry.get('process')
+        if process in self.rule_process_index:
+            hits |= self.rule_process_index[process]
         
-        return False
+        return hits
     
     def _check_threat_intel(self, log_entry: Dict) -> List[Dict]:
         """Match against offline threat intelligence"""
         matches = []
-        message = log_entry.get('message', '')
+        message = log_entry.get('message') or ''
         
         # IP address matching
         ip_pattern = r'\b(?:\d{1,3}\.){3}\d{1,3}\b'
         ips_in_log = re.findall(ip_pattern, message)
         
         for ip in ips_in_log:
-            if ip in self.threat_intel.get('ips', []):
+            matched = self.threat_intel.match_ip(ip)
+            if matched:
                 matches.append({
                     'type': 'ioc',
                     'name': 'Malicious IP Detected',
@@ -196,7 +243,8 @@ class DetectionEngine:
                     'severity': 'high',
                     'details': {
                         'indicator': ip,
-                        'indicator_type': 'ip_address'
+                        'indicator_type': 'ip_address',
+                        'matched_indicator': matched
                     }
                 })
         
@@ -205,7 +253,8 @@ class DetectionEngine:
         domains_in_log = re.findall(domain_pattern, message.lower())
         
         for domain in domains_in_log:
-            if domain in self.threat_intel.get('domains', []):
+            matched = self.threat_intel.match_domain(domain)
+            if matched:
                 matches.append({
                     'type': 'ioc',
                     'name': 'Malicious Domain Detected',
@@ -213,13 +262,31 @@ class DetectionEngine:
                     'severity': 'high',
                     'details': {
                         'indicator': domain,
-                        'indicator_type': 'domain'
+                        'indicator_type': 'domain',
+                        'matched_indicator': matched
+                    }
+                })
+        
+        # File hash matching (MD5 / SHA-1 / SHA-256)
+        hash_pattern = r'\b(?:[a-fA-F0-9]{64}|[a-fA-F0-9]{40}|[a-fA-F0-9]{32})\b'
+        hashes_in_log = re.findall(hash_pattern, message)
+        
+        for file_hash in hashes_in_log:
+            if self.threat_intel.match_hash(file_hash):
+                matches.append({
+                    'type': 'ioc',
+                    'name': 'Malicious File Hash Detected',
+                    'score': 1.0,
+                    'severity': 'high',
+                    'details': {
+                        'indicator': file_hash,
+                        'indicator_type': 'file_hash'
                     }
                 })
         
         # Malicious process detection
         process = log_entry.get('process', '')
-        if process in self.threat_intel.get('processes', []):
+        if self.threat_intel.match_process(process):
             matches.append({
                 'type': 'ioc',
                 'name': 'Malicious Process Detected',
@@ -236,24 +303,21 @@ class DetectionEngine:
     def _detect_ttps(self, log_entry: Dict) -> List[Dict]:
         """Detect MITRE ATT&CK TTPs"""
         matches = []
-        message = log_entry.get('message', '').lower()
-        
-        for ttp_id, ttp_data in self.ttp_patterns.items():
-            for pattern in ttp_data.get('patterns', []):
-                if re.search(pattern, message, re.IGNORECASE):
-                    matches.append({
-                        'type': 'ttp',
-                        'name': ttp_data['name'],
-                        'score': 1.0,
-                        'severity': ttp_data.get('severity', 'high'),
-                        'details': {
-                            'ttp_id': ttp_id,
-                            'tactic': ttp_data.get('tactic'),
-                            'technique': ttp_data.get('technique'),
-                            'description': ttp_data.get('description')
-                        }
-                    })
-                    break  # Only match once per TTP
+        
+        for ttp_id in self.ttp_matcher.match(log_entry.get('message') or ''):
+            ttp_data = self.ttp_patterns[ttp_id]
+            matches.append({
+                'type': 'ttp',
+                'name': ttp_data['name'],
+                'score': 1.0,
+                'severity': ttp_data.get('severity', 'high'),
+                'details': {
+                    'ttp_id': ttp_id,
+                    'tactic': ttp_data.get('tactic'),
+                    'technique': ttp_data.get('technique'),
+                    'description': ttp_data.get('description')
+                }
+            })
         
         return matches
     
@@ -269,18 +333,82 @@ class DetectionEngine:
     @lru_cache(maxsize=1000)
     def _cached_rule_match(self, message: str) -> tuple:
         """Cache rule matches for identical messages"""
-        matches = []
-        for rule in self.rules:
-            if self._rule_matches(rule, {'message': message}):
-                matches.append(rule['id'])
-        return tuple(matches)
+        indices = sorted(self._matching_rule_indices({'message': message}))
+        return tuple(self.rules[idx]['id'] for idx in indices)
+    
+    def _detect_anomalies(self, messages: List[str], templates: List[TemplateMatch] = None) -> List[Dict]:
+        """
+        AI-based anomaly detection for a whole batch, one verdict per message
+        
+        With calibrated thresholds a verdict does not depend on the rest of the
+        batch, so messages sharing a template and parameter classes are scored
+        once and later repeats are served from the result cache.
+        """
+        results = [{'is_anomaly': False, 'score': 0.0} for _ in messages]
+        
+        valid = [idx for idx, msg in enumerate(messages) if msg and isinstance(msg, str)]
+        if not valid:
+            return results
+        
+        use_cache = templates is not None and self.ai_engine.calibration is not None
+        if not use_cache:
+            to_score = valid
+        else:
+            to_score, pending = [], {}
+            for idx in valid:
+                key = ('anomaly',) + templates[idx].cache_key
+                cached = self.result_cache.get(key)
+                if cached is not None:
+                    # Copied so no two log entries share (and could mutate) one verdict
+                    results[idx] = dict(cached)
+                elif key in pending:
+                    pending[key].append(idx)
+                else:
+                    pending[key] = [idx]
+                    to_score.append(idx)
+        
+        if to_score:
+            scored = [{'is_anomaly': False, 'score': 0.0} for _ in to_score]
+            analysis_result = self.ai_engine.analyze([messages[idx] for idx in to_score])
+            for anomaly in analysis_result['anomalies']:
+                scored[anomaly['index']] = {
+                    'is_anomaly': True,
+                    'score': anomaly['score']
+                }
+            
+            for idx, verdict in zip(to_score, scored):
+                if not use_cache:
+                    results[idx] = verdict
+                    continue
+                key = ('anomaly',) + templates[idx].cache_key
+                self.result_cache.put(key, verdict)
+                for same_idx in pending[key]:
+                    results[same_idx] = dict(verdict)
+        
+        return results
     
     def batch_analyze(self, log_entries: List[Dict]) -> List[Dict]:
-        """Analyze multiple log entries efficiently"""
+        """
+        Analyze multiple log entries, scoring all messages through the AI models in batches
+        Each result carries its mined template and how often that template has been seen,
+        which lets callers flag rare templates
+        """
+        messages = [entry.get('message') for entry in log_entries]
+        templates = [
+            self.template_miner.add_message(msg) if isinstance(msg, str) and msg else None
+            for msg in messages
+        ]
+        anomaly_results = self._detect_anomalies(messages, templates)
         results = []
         
-        for entry in log_entries:
-            result = self.analyze_log(entry)
+        for entry, anomaly_result, template in zip(log_entries, anomaly_results, templates):
+            result = self.analyze_log(entry, anomaly_result=anomaly_result)
+            if template is not None:
+                result['template'] = {
+                    'id': template.cluster_id,
+                    'template': template.template,
+                    'count': template.count
+                }
             result['log_entry'] = entry
             results.append(result)
         
@@ -0,0 +1,181 @@
+"""
+Indexed offline IoC store.
+
+Replaces linear scans over the raw indicators.json lists with:
+- hash sets for exact IPs, domains, file hashes and process names
+- binary radix tries (IPv4 / IPv6) for CIDR blocks
+- a reversed-label trie so subdomains match their parent domain indicator
+"""
+
+import ipaddress
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CIDRTrie:
+    """Binary radix trie over address bits, returning the longest matching prefix"""
+
+    _TERMINAL = 2  # slot holding the network string at a prefix end
+
+    def __init__(self, max_bits: int):
+        self.max_bits = max_bits
+        self._root = [None, None, None]
+        self._size = 0
+
+    def add(self, network):
+        bits = int(network.network_address)
+        node = self._root
+        for i in range(network.prefixlen):
+            bit = (bits >> (self.max_bits - 1 - i)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        if node[self._TERMINAL] is None:
+            self._size += 1
+        node[self._TERMINAL] = str(network)
+
+    def lookup(self, address) -> Optional[str]:
+        bits = int(address)
+        node = self._root
+        best = node[self._TERMINAL]
+        for i in range(self.max_bits):
+            node = node[(bits >> (self.max_bits - 1 - i)) & 1]
+            if node is None:
+                break
+            if node[self._TERMINAL] is not None:
+                best = node[self._TERMINAL]
+        return best
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class DomainTrie:
+    """Trie keyed on reversed domain labels (com -> evil -> www)"""
+
+    _END = ''  # labels are never empty, so '' marks an indicator
+
+    def __init__(self):
+        self._root: Dict[str, dict] = {}
+        self._size = 0
+
+    def add(self, domain: str):
+        node = self._root
+        for label in reversed(domain.split('.')):
+            node = node.setdefault(label, {})
+        if self._END not in node:
+            self._size += 1
+        node[self._END] = domain
+
+    def lookup(self, domain: str) -> Optional[str]:
+        """Return the closest parent indicator of domain (or domain itself)"""
+        node = self._root
+        best = None
+        for label in reversed(domain.split('.')):
+            node = node.get(label)
+            if node is None:
+                break
+            if self._END in node:
+                best = node[self._END]
+        return best
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class IoCIndex:
+    """O(1) / O(length) lookups over the offline threat intelligence feed"""
+
+    def __init__(self):
+        self.ips = set()
+        self.cidrs_v4 = CIDRTrie(32)
+        self.cidrs_v6 = CIDRTrie(128)
+        self.domains = set()
+        self.domain_trie = DomainTrie()
+        self.hashes = set()
+        self.processes = set()
+
+    @classmethod
+    def from_dict(cls, intel: Dict[str, Iterable[str]]) -> "IoCIndex":
+        index = cls()
+
+        for value in list(intel.get('ips', [])) + list(intel.get('cidrs', [])):
+            index.add_ip(value)
+        for domain in intel.get('domains', []):
+            index.add_domain(domain)
+        index.hashes.update(h.lower() for h in intel.get('hashes', []) if h)
+        index.processes.update(p for p in intel.get('processes', []) if p)
+
+        return index
+
+    @classmethod
+    def load(cls, intel_file: Path) -> "IoCIndex":
+        """Load indicators.json (an empty index if the feed is missing)"""
+        if not intel_file.exists():
+            return cls()
+
+        with open(intel_file, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+    def add_ip(self, value: str):
+        value = value.strip()
+        if '/' not in value:
+            self.ips.add(value)
+            return
+        try:
+            network = ipaddress.ip_network(value, strict=False)
+        except ValueError:
+            logger.warning(f"Skipping invalid CIDR indicator: {value}")
+            return
+        if network.version == 4:
+            self.cidrs_v4.add(network)
+        else:
+            self.cidrs_v6.add(network)
+
+    def add_domain(self, value: str):
+        domain = value.strip().lower().rstrip('.')
+        if domain.startswith('*.'):
+            domain = domain[2:]
+        if domain:
+            self.domains.add(domain)
+            self.domain_trie.add(domain)
+
+    def match_ip(self, ip: str) -> Optional[str]:
+        """Return the matching indicator (exact IP or CIDR block), if any"""
+        if ip in self.ips:
+            return ip
+        if not (len(self.cidrs_v4) or len(self.cidrs_v6)):
+            return None
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        trie = self.cidrs_v4 if address.version == 4 else self.cidrs_v6
+        return trie.lookup(address)
+
+    def match_domain(self, domain: str) -> Optional[str]:
+        """Return the matching indicator (the domain or a parent domain), if any"""
+        domain = domain.lower().rstrip('.')
+        if domain in self.domains:
+            return domain
+        return self.domain_trie.lookup(domain)
+
+    def match_hash(self, value: str) -> bool:
+        value = value.lower()
+        return value in self.hashes
+
+    def match_process(self, process: str) -> bool:
+        return bool(process) and process in self.processes
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'ips': len(self.ips),
+            'cidrs': len(self.cidrs_v4) + len(self.cidrs_v6),
+            'domains': len(self.domains),
+            'hashes': len(self.hashes),
+            'processes': len(self.processes),
+        }
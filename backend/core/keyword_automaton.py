@@ -0,0 +1,91 @@
+"""
+Aho-Corasick multi-pattern keyword automaton.
+
+Compiles a set of keywords once and reports every keyword occurring in a
+message in a single left-to-right pass, so matching cost depends on the
+message length rather than on the number of keywords loaded.
+"""
+
+from collections import deque
+from typing import Dict, Hashable, Iterable, List, Set, Tuple
+
+
+class KeywordAutomaton:
+    """Case-insensitive Aho-Corasick automaton mapping keywords to payloads"""
+
+    def __init__(self):
+        # Node 0 is the root; each node has goto edges, a failure link and
+        # the payloads of every keyword ending at that node (output links merged)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Set[Hashable]] = [set()]
+        self._compiled = False
+
+    def add(self, keyword: str, payload: Hashable):
+        """Register a keyword; every hit reports its payload"""
+        if not keyword:
+            return
+
+        node = 0
+        for char in keyword.lower():
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(set())
+            node = nxt
+
+        self._out[node].add(payload)
+        self._compiled = False
+
+    def compile(self):
+        """Build failure links (BFS) and merge output sets along them"""
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] |= self._out[self._fail[child]]
+
+        self._compiled = True
+
+    @classmethod
+    def from_keywords(cls, keywords: Iterable[Tuple[str, Hashable]]) -> "KeywordAutomaton":
+        """Build and compile an automaton from (keyword, payload) pairs"""
+        automaton = cls()
+        for keyword, payload in keywords:
+            automaton.add(keyword, payload)
+        automaton.compile()
+        return automaton
+
+    def __len__(self) -> int:
+        return len(self._goto) - 1
+
+    def search(self, text: str) -> Set[Hashable]:
+        """Return the payloads of every keyword found in text"""
+        if not self._compiled:
+            self.compile()
+
+        goto, fail, out = self._goto, self._fail, self._out
+        hits = set()
+        node = 0
+
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                hits |= out[node]
+
+        return hits
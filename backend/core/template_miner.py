@@ -0,0 +1,183 @@
+"""
+Online log template mining (Drain) and a bounded LRU result cache.
+
+Production logs repeat heavily: sshd, cron and kernel lines differ only in
+IPs, PIDs and counters. TemplateMiner assigns every message to a template
+such as "Accepted password for <*> from <IP> port <NUM> ssh2" using the Drain
+fixed-depth parse tree, and keeps per-template counts. DetectionEngine uses
+the template together with the class of each variable token as a cache key
+so repeated templates skip model inference.
+"""
+
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Tuple
+
+WILDCARD = '<*>'
+
+# Masked before tokenizing; order matters (IPs before plain numbers)
+MASKS = [
+    (re.compile(r'(?<![\w.])(?:\d{1,3}\.){3}\d{1,3}(?::\d{1,5})?(?![\w.])'), '<IP>'),
+    (re.compile(r'\b0x[0-9a-fA-F]+\b'), '<HEX>'),
+    (re.compile(r'\b[0-9a-fA-F]{16,}\b'), '<HEX>'),
+    (re.compile(r'(?<![\w.])[-+]?\d+(?:\.\d+)?(?![\w.])'), '<NUM>'),
+]
+MASK_LABELS = {label for _, label in MASKS}
+
+
+@dataclass
+class LogCluster:
+    cluster_id: int
+    template: List[str]
+    size: int = 1
+
+    @property
+    def template_str(self) -> str:
+        return ' '.join(self.template)
+
+
+@dataclass
+class TemplateMatch:
+    cluster_id: int
+    template: str
+    param_class: Tuple[str, ...]
+    count: int
+
+    @property
+    def cache_key(self) -> Tuple[str, Tuple[str, ...]]:
+        return (self.template, self.param_class)
+
+
+class TemplateMiner:
+    """
+    Drain-style online template miner.
+    Long-lived analysis workers see an unbounded stream of messages, so once
+    max_clusters templates exist the tree is reset and mining starts over
+    (cluster ids keep increasing, so ids are never reused).
+    """
+
+    def __init__(self, depth: int = 4, sim_threshold: float = 0.4, max_children: int = 100,
+                 max_clusters: int = 20_000):
+        self.depth = max(depth, 3)
+        self.sim_threshold = sim_threshold
+        self.max_children = max_children
+        self.max_clusters = max_clusters
+        self.root: Dict = {}
+        self.clusters: List[LogCluster] = []
+        self._last_id = 0
+
+    def reset(self):
+        """Forget all templates (e.g. between jobs or when max_clusters is reached)"""
+        self.root = {}
+        self.clusters = []
+
+    @staticmethod
+    def _tokenize(message: str) -> List[str]:
+        for pattern, label in MASKS:
+            message = pattern.sub(label, message)
+        return message.split()
+
+    @staticmethod
+    def _param_class(token: str) -> str:
+        if token in MASK_LABELS:
+            return token
+        if token.isalpha():
+            return 'ALPHA'
+        if token.isalnum():
+            return 'ALNUM'
+        return 'MIXED'
+
+    def _leaf(self, tokens: List[str]) -> list:
+        """Walk (building as needed) the fixed-depth prefix tree down to a cluster list"""
+        node = self.root.setdefault(len(tokens), {})
+
+        for token in tokens[:self.depth - 2]:
+            key = WILDCARD if any(c.isdigit() for c in token) or token in MASK_LABELS else token
+            if key not in node and len(node) >= self.max_children:
+                key = WILDCARD
+            node = node.setdefault(key, {})
+
+        return node.setdefault('', [])
+
+    def _best_cluster(self, clusters: List[LogCluster], tokens: List[str]) -> Optional[LogCluster]:
+        best, best_sim, best_params = None, -1.0, -1
+        for cluster in clusters:
+            same = params = 0
+            for template_token, token in zip(cluster.template, tokens):
+                if template_token == WILDCARD:
+                    params += 1
+                elif template_token == token:
+                    same += 1
+            sim = same / len(tokens) if tokens else 1.0
+            if sim > best_sim or (sim == best_sim and params > best_params):
+                best, best_sim, best_params = cluster, sim, params
+
+        if best is not None and best_sim >= self.sim_threshold:
+            return best
+        return None
+
+    def add_message(self, message: str) -> TemplateMatch:
+        """Assign message to a template (creating or generalizing one as needed)"""
+        tokens = self._tokenize(message or '')
+        leaf = self._leaf(tokens)
+        cluster = self._best_cluster(leaf, tokens)
+
+        if cluster is None:
+            if len(self.clusters) >= self.max_clusters:
+                self.reset()
+                leaf = self._leaf(tokens)
+            self._last_id += 1
+            cluster = LogCluster(cluster_id=self._last_id, template=list(tokens))
+            self.clusters.append(cluster)
+            leaf.append(cluster)
+        else:
+            cluster.template = [
+                t if t == token else WILDCARD for t, token in zip(cluster.template, tokens)
+            ]
+            cluster.size += 1
+
+        param_class = tuple(
+            self._param_class(token)
+            for template_token, token in zip(cluster.template, tokens)
+            if template_token == WILDCARD
+        )
+        return TemplateMatch(cluster.cluster_id, cluster.template_str, param_class, cluster.size)
+
+    def __len__(self) -> int:
+        return len(self.clusters)
+
+
+class LRUCache:
+    """Bounded least-recently-used cache with hit/miss counters"""
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default=None):
+        value = self._data.get(key, self._MISSING)
+        if value is self._MISSING:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        return {'size': len(self._data), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
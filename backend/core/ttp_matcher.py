@@ -0,0 +1,104 @@
+"""
+Single-pass MITRE ATT&CK TTP matcher.
+
+Every TTP regex is compiled once when patterns load. A required literal is
+extracted from each pattern and fed into one Aho-Corasick automaton, so a
+single scan of the message yields the candidate patterns; only those are
+confirmed with their precompiled regex. Patterns without a usable literal
+(top-level alternation, pure character classes, ...) are always confirmed.
+"""
+
+import logging
+import re
+from typing import Dict, List, Tuple
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+from core.keyword_automaton import KeywordAutomaton
+
+logger = logging.getLogger(__name__)
+
+_LITERAL = sre_parse.LITERAL
+
+# re.IGNORECASE folds these non-ASCII characters onto ASCII letters, which
+# str.lower() does not; normalise them so the prefilter never misses a match
+_IGNORECASE_FOLDS = str.maketrans({'ı': 'i', 'ſ': 's'})
+
+
+def required_literal(pattern: str) -> str:
+    """
+    Longest ASCII literal run that every match of pattern must contain.
+    Returns '' when no such literal can be derived.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, re.IGNORECASE)
+    except re.error:
+        return ''
+
+    best, run = '', []
+    for op, av in list(parsed) + [(None, None)]:
+        if op is _LITERAL and av < 128:
+            run.append(chr(av))
+            continue
+        if len(run) > len(best):
+            best = ''.join(run)
+        run = []
+
+    return best.lower()
+
+
+class TTPMatcher:
+    """Precompiled literal-prefilter + regex-confirm matcher for TTP patterns"""
+
+    def __init__(self, ttp_patterns: Dict[str, Dict]):
+        self.ttp_ids: List[str] = list(ttp_patterns)
+        # compiled[ttp_idx] -> list of compiled regexes, in file order
+        self.compiled: List[List[re.Pattern]] = []
+        # patterns that must always be confirmed: (ttp_idx, pattern_idx)
+        self.unfiltered: List[Tuple[int, int]] = []
+
+        keywords = []
+        for ttp_idx, ttp_id in enumerate(self.ttp_ids):
+            regexes = []
+            for pattern in ttp_patterns[ttp_id].get('patterns', []):
+                try:
+                    regex = re.compile(pattern, re.IGNORECASE)
+                except re.error as e:
+                    logger.warning(f"Skipping invalid TTP pattern for {ttp_id}: {pattern!r} ({e})")
+                    continue
+
+                key = (ttp_idx, len(regexes))
+                regexes.append(regex)
+
+                literal = required_literal(pattern)
+                if literal:
+                    keywords.append((literal, key))
+                else:
+                    self.unfiltered.append(key)
+
+            self.compiled.append(regexes)
+
+        self.automaton = KeywordAutomaton.from_keywords(keywords)
+
+    def __len__(self) -> int:
+        return sum(len(regexes) for regexes in self.compiled)
+
+    def match(self, message: str) -> List[str]:
+        """Return the IDs of every TTP with at least one matching pattern, in load order"""
+        message = (message or '').lower()
+        candidates = self.automaton.search(message.translate(_IGNORECASE_FOLDS))
+        candidates.update(self.unfiltered)
+        if not candidates:
+            return []
+
+        matched = []
+        for ttp_idx, pattern_idx in sorted(candidates):
+            if matched and matched[-1] == ttp_idx:
+                continue  # Only match once per TTP
+            if self.compiled[ttp_idx][pattern_idx].search(message):
+                matched.append(ttp_idx)
+
+        return [self.ttp_ids[idx] for idx in matched]
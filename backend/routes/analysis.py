@@ -1,105 +1,314 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from services.storage_service import StorageService
-from core.detection_engine import DetectionEngine
+from services.analysis_executor import AnalysisExecutor
+from services.job_manager import job_manager, Job
+from core.detection_engine import detection_content_version
+from config import ANALYSIS_CHUNK_SIZE
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+from datetime import datetime
+from typing import Optional
+import polars as pl
+import heapq
 import json
 import asyncio
-import os
 
 router = APIRouter()
-detection_engine = DetectionEngine()
+analysis_executor = AnalysisExecutor()
 
-# File path for progress tracking
-PROGRESS_FILE = "data/analysis_progress.json"
+# Job kinds: incremental analysis and time-window rescoring
+ANALYSIS_JOB = "comprehensive"
+RESCORE_JOB = "rescore"
+
+# Highest-scoring threats kept in a finished job's details for the threat view
+TOP_THREATS = 50
+
+RESULT_SCHEMA = {
+    'id': pl.Int64,
+    'is_anomaly': pl.Boolean,
+    'anomaly_score': pl.Float64,
+    'severity': pl.Utf8,
+    'detections': pl.Utf8,
+    'ttp_tags': pl.Utf8,
+}
 
 @router.post("/analyze/comprehensive")
-async def comprehensive_analysis(background_tasks: BackgroundTasks):
+async def comprehensive_analysis(
+    background_tasks: BackgroundTasks,
+    source_file: Optional[str] = None,
+    rescore_from: Optional[datetime] = None,
+    rescore_to: Optional[datetime] = None
+):
     """
     Run comprehensive analysis in the background with progress tracking.
     Returns immediately, while analysis runs asynchronously.
+    Only logs ingested since the last run are scored. Pass source_file to analyze
+    only logs from that file; jobs with different scopes run side by side, a second
+    request for a running scope joins that job. Pass rescore_from (and optionally
+    rescore_to) to re-score logs from that time window, e.g. after a SOUP update.
     """
-    background_tasks.add_task(run_analysis_task)
+    if rescore_from is not None:
+        window = (rescore_from, rescore_to or datetime.now())
+        if window[0] >= window[1]:
+            raise HTTPException(status_code=400, detail="rescore_from must be before rescore_to")
+        job = job_manager.create(RESCORE_JOB, scope=source_file)
+        background_tasks.add_task(run_analysis_task, job, window)
+    else:
+        job = job_manager.active(ANALYSIS_JOB, source_file)
+        if job is not None:
+            return {
+                "status": "already_running",
+                "job_id": job.job_id,
+                "message": "Analysis for this scope is already running.",
+                "check_progress_at": f"/analysis/jobs/{job.job_id}",
+                "events_at": f"/analysis/jobs/{job.job_id}/events"
+            }
+        job = job_manager.create(ANALYSIS_JOB, scope=source_file)
+        background_tasks.add_task(run_analysis_task, job)
     
     return {
         "status": "started",
+        "job_id": job.job_id,
         "message": "Comprehensive analysis started in background.",
-        "check_progress_at": "/analysis/progress"
+        "check_progress_at": f"/analysis/jobs/{job.job_id}",
+        "events_at": f"/analysis/jobs/{job.job_id}/events"
+    }
+
+
+@router.get("/watermarks")
+async def get_watermarks():
+    """Incremental analysis position per scope and detection content version."""
+    return {
+        "detection_version": await asyncio.to_thread(detection_content_version),
+        "watermarks": StorageService.list_watermarks()
     }
 
 
 @router.get("/analysis/progress")
 async def get_analysis_progress():
-    """Fetch current analysis progress."""
-    if not os.path.exists(PROGRESS_FILE):
+    """Fetch progress of the most recent analysis job."""
+    job = job_manager.latest(ANALYSIS_JOB)
+    if job is None:
         return {"status": "idle", "progress": 0, "message": "No analysis running."}
-    
-    with open(PROGRESS_FILE, "r") as f:
-        return json.load(f)
+    return job.to_dict()
+
+
+@router.get("/jobs")
+async def list_jobs():
+    """Running and recently finished background jobs, newest first."""
+    return {"jobs": [job.to_dict() for job in job_manager.list()]}
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Current state of one job: progress, throughput, ETA and stage timings."""
+    return _get_job_or_404(job_id).to_dict()
+
 
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-Sent Events stream of job progress; closes when the job finishes."""
+    job = _get_job_or_404(job_id)
+    return StreamingResponse(
+        job_manager.events(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _get_job_or_404(job_id: str) -> Job:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+async def run_analysis_task(job: Job, rescore_window: tuple = None):
+    """
+    Incrementally analyzes logs in chunks and reports progress.
+    Only rows past the scope's watermark for the current detection content version
+    are read, by keyset on the monotonic log id, so no run rescans analyzed rows.
+    Each chunk is scored in one batch and written back with a single UPDATE that also
+    advances the watermark, so a crashed run resumes after the last written chunk.
+    With rescore_window=(start, end) the logs from that time window are scored
+    again instead and the watermark is left alone.
+    Scoring runs in the analysis process pool; this coroutine only reads chunks and
+    writes results, so the API stays responsive during long runs.
+    """
+    pending = deque()  # scoring futures of chunks read ahead, oldest first
+    conditions, params = [], []
+    if job.scope:
+        conditions.append("source_file = ?")
+        params.append(job.scope)
+    version = None
 
-async def run_analysis_task():
-    """Performs the full comprehensive analysis asynchronously and updates progress."""
     try:
-        # Initialize progress
-        save_progress(0, "Fetching logs from database...")
+        job_manager.update(job, message="Checking detection content version...")
+        version = await asyncio.to_thread(detection_content_version)
+        # The job keeps the workers of its version; workers that loaded older
+        # rules / intel / models are retired once the jobs using them finish
+        with analysis_executor.using(version):
+            await _analyze_chunks(job, version, rescore_window, conditions, params, pending)
+
+    except asyncio.CancelledError:
+        # A chunk future was cancelled (e.g. its pool was shut down); the job must
+        # still end, or its scope would report "already_running" until a restart
+        _cancel(pending)
+        job_manager.finish(job, "Error: analysis was cancelled", failed=True)
+    except Exception as e:
+        _cancel(pending)
+        if isinstance(e, BrokenProcessPool):
+            # A worker died (e.g. out of memory); the next job starts a fresh pool
+            analysis_executor.discard(version)
+        job_manager.finish(job, f"Error: {str(e)}", failed=True)
+
+
+async def _analyze_chunks(job: Job, version: str, rescore_window: tuple, conditions: list, params: list, pending: deque):
+    """Read, score and write the job's rows chunk by chunk on the version's workers"""
+    if rescore_window:
+        conditions += ["timestamp >= ?", "timestamp < ?"]
+        params += list(rescore_window)
+        last_id = 0
+    else:
+        last_id = await asyncio.to_thread(StorageService.get_watermark, job.scope, version)
+        if last_id is None:
+            last_id = await asyncio.to_thread(
+                StorageService.initial_watermark, job.scope, _and(conditions), tuple(params)
+            )
+            await asyncio.to_thread(StorageService.save_watermark, job.scope, version, last_id)
+        if job.scope:
+            # Rows up to the global watermark were already scored by an unscoped job.
+            # The reverse is not tracked: an unscoped job scores rows a scoped job
+            # already did again (same version, so the same results are rewritten)
+            global_id = await asyncio.to_thread(StorageService.get_watermark, None, version)
+            last_id = max(last_id, global_id or 0)
+
+    where = _and(conditions)
 
-        logs = StorageService.query_logs(
-            "SELECT id, timestamp, host, process, message FROM logs WHERE detections IS NULL LIMIT 5000"
+    total = (await asyncio.to_thread(
+        StorageService.query_logs, f"SELECT COUNT(*) FROM logs WHERE id > ?{where}", (last_id, *params)
+    ))[0][0]
+
+    if not total:
+        job_manager.finish(job, "No new logs to analyze.")
+        return
+
+    analyzed = 0
+    threats_found = 0
+    top_threats = []
+    job_manager.start(job, total, message=f"Analyzing {total} logs (detection version {version})...")
+
+    read_id = last_id
+    exhausted = False
+
+    while pending or not exhausted:
+        # Keep the worker pool fed while earlier chunks are being scored
+        while not exhausted and len(pending) < analysis_executor.max_in_flight:
+            with job_manager.stage(job, "read"):
+                logs = await asyncio.to_thread(
+                    StorageService.query_logs,
+                    "SELECT id, timestamp, host, process, message FROM logs "
+                    f"WHERE id > ?{where} ORDER BY id LIMIT ?",
+                    (read_id, *params, ANALYSIS_CHUNK_SIZE)
+                )
+            if not logs:
+                exhausted = True
+                break
+
+            log_entries = [
+                {'id': log[0], 'timestamp': log[1], 'host': log[2], 'process': log[3], 'message': log[4]}
+                for log in logs
+            ]
+            read_id = logs[-1][0]
+            pending.append(analysis_executor.submit(log_entries, version))
+
+        if not pending:
+            break
+
+        # Results are written oldest chunk first so the watermark only moves forward.
+        # "score" is the time spent waiting on workers beyond reading and writing
+        future = pending.popleft()
+        with job_manager.stage(job, "score"):
+            results = await future
+        threats = [result for result in results if result['is_threat']]
+        threats_found += len(threats)
+        top_threats = heapq.nlargest(
+            TOP_THREATS, top_threats + [threat_summary(result) for result in threats],
+            key=lambda threat: threat['score']
         )
+        analyzed += len(results)
 
-        if not logs:
-            save_progress(100, "No new logs to analyze.")
-            return
-
-        log_entries = [
-            {'id': log[0], 'timestamp': log[1], 'host': log[2], 'process': log[3], 'message': log[4]}
-            for log in logs
-        ]
-
-        total = len(log_entries)
-        analyzed = 0
-        threats_found = 0
-
-        save_progress(5, f"Analyzing {total} logs...")
-
-        results = detection_engine.batch_analyze(log_entries)
-
-        with StorageService.get_connection() as conn:
-            for result in results:
-                analyzed += 1
-                log_id = result['log_entry']['id']
-
-                if result['is_threat']:
-                    threats_found += 1
-                    severity = result['severity']
-                    score = result['detections'][0]['score'] if result['detections'] else 0.0
-                    detections_json = json.dumps(result['detections'])
-                    conn.execute(
-                        "UPDATE logs SET is_anomaly = TRUE, anomaly_score = ?, severity = ?, detections = ? WHERE id = ?",
-                        (score, severity, detections_json, log_id)
-                    )
-                else:
-                    conn.execute("UPDATE logs SET detections = '[]' WHERE id = ?", (log_id,))
-                
-                # Update progress every 100 logs
-                if analyzed % 100 == 0 or analyzed == total:
-                    percent = round((analyzed / total) * 100, 2)
-                    save_progress(percent, f"Analyzed {analyzed}/{total} logs...")
-
-                # Allow other background tasks to run
-                await asyncio.sleep(0.01)
-
-        save_progress(100, f"Completed analysis. Threats found: {threats_found}")
+        with job_manager.stage(job, "write"):
+            frame = await asyncio.to_thread(results_to_frame, results, bool(rescore_window))
+            await asyncio.to_thread(
+                StorageService.apply_analysis_results, frame,
+                job.scope, None if rescore_window else version
+            )
+
+        job_manager.update(
+            job, processed=analyzed, threats_found=threats_found,
+            message=f"Analyzed {analyzed}/{total} logs..."
+        )
+
+    job.details["top_threats"] = top_threats
+    job_manager.finish(job, f"Completed analysis. Threats found: {threats_found}")
 
-    except Exception as e:
-        save_progress(100, f"Error: {str(e)}")
 
+def _cancel(pending: deque):
+    for future in pending:
+        future.cancel()
 
-def save_progress(percent: float, message: str):
-    """Save current progress to a JSON file for monitoring."""
-    data = {
-        "status": "running" if percent < 100 else "completed",
-        "progress": percent,
-        "message": message
+
+def _and(conditions: list) -> str:
+    return "".join(f" AND {condition}" for condition in conditions)
+
+
+def threat_summary(result: dict) -> dict:
+    """One threat as the frontend threat view shows it, from its strongest detection"""
+    entry = result['log_entry']
+    top = max(result['detections'], key=lambda detection: detection['score'])
+    return {
+        'id': entry['id'],
+        'timestamp': entry['timestamp'].isoformat() if entry['timestamp'] else None,
+        'host': entry['host'] or 'unknown',
+        'severity': result['severity'],
+        'detection_type': top['type'],
+        'score': top['score'],
+        'message': entry['message'] or '',
+        'details': top['details'],
     }
-    with open(PROGRESS_FILE, "w") as f:
-        json.dump(data, f)
+
+
+def results_to_frame(results: list, rescore: bool = False) -> pl.DataFrame:
+    """
+    Column values written back to the logs table for a batch of analysis results.
+    Incremental runs leave is_anomaly / anomaly_score / severity of clean rows null,
+    which keeps the stored value; a rescore writes the clean values explicitly so
+    rows flagged by older detection content are cleared.
+    """
+    rows = {name: [] for name in RESULT_SCHEMA}
+
+    for result in results:
+        rows['id'].append(result['log_entry']['id'])
+        rows['detections'].append(json.dumps(result['detections']) if result['is_threat'] else '[]')
+        rows['ttp_tags'].append(json.dumps([
+            detection['details']['ttp_id'] for detection in result['detections'] if detection['type'] == 'ttp'
+        ]))
+
+        if result['is_threat']:
+            rows['is_anomaly'].append(True)
+            rows['anomaly_score'].append(result['detections'][0]['score'] if result['detections'] else 0.0)
+            rows['severity'].append(result['severity'])
+        elif rescore:
+            # Same values as the column defaults of a never-flagged row
+            rows['is_anomaly'].append(False)
+            rows['anomaly_score'].append(0.0)
+            rows['severity'].append('low')
+        else:
+            # Null keeps the stored value, as the per-row UPDATE used to
+            rows['is_anomaly'].append(None)
+            rows['anomaly_score'].append(None)
+            rows['severity'].append(None)
+
+    return pl.DataFrame(rows, schema=RESULT_SCHEMA)
@@ -1,6 +1,4 @@
 from fastapi import APIRouter
-from core.database import get_db_collection
-from services.ai_engine import AIEngine
 from core.isolation_validator import IsolationValidator
 from config import DEPLOYMENT_MODE
 
@@ -8,11 +8,16 @@ from typing import List, Optional
 from pydantic import BaseModel, Field
 
 from config import TEMP_DIR, LOGS_DIR
-from services.parser_service import LogParser
 from services.collector_service import LogCollector
 from services.storage_service import StorageService
+from services.ingest_service import IngestService
+from services.job_manager import job_manager
 
 router = APIRouter()
+ingest_service = IngestService()
+
+# Job kind of /store runs
+INGEST_JOB = "ingest"
 
 # Ensure directories exist
 TEMP_DIR.mkdir(parents=True, exist_ok=True)
@@ -33,9 +38,9 @@ class UploadResponse(BaseModel):
 async def upload_logs(file: UploadFile = File(...)):
     """
     Upload a log file for offline analysis
-    Supports: .log, .txt, .evtx, .json, .csv, .gz
+    Supports: .log, .txt, .evtx, .json, .csv, compressed (.gz, .bz2, .xz, .zst) and tar bundles
     """
-    allowed_extensions = {'.log', '.txt', '.evtx', '.json', '.csv', '.evt', '.gz'}
+    allowed_extensions = {'.log', '.txt', '.evtx', '.json', '.csv', '.evt', '.gz', '.bz2', '.xz', '.zst', '.tar', '.tgz', '.tbz2', '.txz'}
     file_ext = Path(file.filename).suffix.lower()
 
     if file_ext not in allowed_extensions:
@@ -260,13 +265,16 @@ async def parse_uploaded_logs():
         if not filepaths:
             return {"status": "success", "message": "No files to parse."}
 
-        df = LogParser.parse_from_filepaths(filepaths)
+        # Files are parsed in parallel and chunk by chunk; nothing is kept in memory
+        counts = await ingest_service.count_rows(filepaths)
+        failed = {name: result["error"] for name, result in counts.items() if result["error"]}
 
         return {
             "status": "Logs parsed successfully",
-            "files_parsed": len(filepaths),
-            "total_rows_parsed": df.shape[0],
-            "files": [p.name for p in filepaths]
+            "files_parsed": len(filepaths) - len(failed),
+            "total_rows_parsed": sum(result["rows"] for result in counts.values()),
+            "files": [p.name for p in filepaths],
+            "failed_files": failed
         }
 
     except Exception as e:
@@ -274,41 +282,29 @@ async def parse_uploaded_logs():
 
 
 @router.post("/store")
-async def store_parsed_logs():
+async def store_parsed_logs(background_tasks: BackgroundTasks, background: bool = False):
     """
     Store parsed logs into DuckDB
     Creates unified schema for analysis
+    Files are parsed and hashed in parallel worker processes and inserted by a
+    single writer. Progress per file is reported on an ingest job
+    (/analysis/jobs/{job_id}); with background=true the call returns at once.
     """
     try:
-        stored_files = []
-        total_rows = 0
-
-        for file_path in TEMP_DIR.iterdir():
-            if file_path.is_dir():
-                continue
-
-            with open(file_path, "r", errors="ignore") as f:
-                content = f.read()
-            lines = content.splitlines()
-
-            try:
-                df = LogParser.parse_syslog_lines(lines)
-            except Exception:
-                try:
-                    df = LogParser.parse_json_logs(lines)
-                except Exception:
-                    df = LogParser.parse_generic_text(lines)
-
-            StorageService.insert_polars_df(df)
-            stored_files.append(file_path.name)
-            total_rows += df.shape[0]
+        filepaths = [p for p in TEMP_DIR.iterdir() if p.is_file()]
+        job = job_manager.create(INGEST_JOB)
+
+        if background:
+            background_tasks.add_task(ingest_service.ingest, filepaths, job)
+            return {
+                "status": "started",
+                "job_id": job.job_id,
+                "check_progress_at": f"/analysis/jobs/{job.job_id}",
+                "events_at": f"/analysis/jobs/{job.job_id}/events"
+            }
 
-        return {
-            "status": "success",
-            "files_stored": len(stored_files),
-            "total_rows": total_rows,
-            "files": stored_files
-        }
+        summary = await ingest_service.ingest(filepaths, job)
+        return {"status": "success", "job_id": job.job_id, **summary}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Storage failed: {str(e)}")
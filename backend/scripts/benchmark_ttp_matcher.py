@@ -0,0 +1,131 @@
+"""
+Benchmark the single-pass TTP matcher against the per-pattern re.search loop
+Expands the shipped ATT&CK patterns to 500+ synthetic techniques and checks
+that both approaches report identical matches
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.ttp_matcher import TTPMatcher  # noqa: E402
+
+TTP_FILE = Path(__file__).resolve().parent.parent / "data" / "mitre_attack" / "ttp_patterns.json"
+
+TOOLS = ["rundll32", "regsvr32", "mshta", "certutil", "bitsadmin", "wmic", "schtasks", "msbuild", "installutil", "cscript"]
+VERBS = ["download", "encode", "inject", "dump", "spawn", "persist", "beacon", "exfil", "stage", "tunnel"]
+
+BENIGN_LOGS = [
+    "Accepted publickey for deploy from 10.1.4.22 port 51122 ssh2",
+    "CRON[2211]: (root) CMD (run-parts /etc/cron.hourly)",
+    "kernel: [ 1234.5678] eth0: link up, 1000 Mbps, full duplex",
+    "systemd[1]: Started Session 42 of user admin.",
+    "GET /api/v1/status HTTP/1.1 200 512 \"-\" \"curl/7.68.0\"",
+    "User alice logged on to WORKSTATION-07 using interactive logon",
+    "sshd[991]: pam_unix(sshd:session): session closed for user git",
+    "dhclient: DHCPACK of 192.168.10.44 from 192.168.10.1",
+]
+
+
+def build_patterns(target: int) -> dict:
+    """Shipped patterns plus synthetic techniques up to the target pattern count"""
+    with open(TTP_FILE, 'r') as f:
+        patterns = json.load(f)
+
+    count = sum(len(ttp.get('patterns', [])) for ttp in patterns.values())
+    n = 0
+    while count < target:
+        tool, verb = TOOLS[n % len(TOOLS)], VERBS[(n // len(TOOLS)) % len(VERBS)]
+        patterns[f"T9{n:03d}"] = {
+            "name": f"Synthetic {tool} {verb} {n}",
+            "tactic": "Execution",
+            "technique": f"T9{n:03d}",
+            "severity": "medium",
+            "patterns": [
+                rf"{tool}\.exe.*-{verb}{n}\b",
+                rf"Invoke-{verb.capitalize()}{n}",
+                rf"{verb}_{n}\s*=\s*\d+",
+            ]
+        }
+        count += 3
+        n += 1
+
+    return patterns
+
+
+def build_messages(patterns: dict, count: int, attack_ratio: float) -> list:
+    rng = random.Random(42)
+    synthetic = [tid for tid in patterns if tid.startswith("T9")]
+    messages = []
+    for _ in range(count):
+        if rng.random() < attack_ratio and synthetic:
+            tid = rng.choice(synthetic)
+            n = int(tid[2:])
+            tool, verb = TOOLS[n % len(TOOLS)], VERBS[(n // len(TOOLS)) % len(VERBS)]
+            messages.append(f"proc {tool}.exe /c -{verb}{n} target=host{rng.randint(1, 99)}")
+        else:
+            messages.append(rng.choice(BENIGN_LOGS))
+    return messages
+
+
+def naive_match(patterns: dict, message: str) -> list:
+    """Reference implementation: the original per-pattern re.search loop"""
+    message = message.lower()
+    matched = []
+    for ttp_id, ttp_data in patterns.items():
+        for pattern in ttp_data.get('patterns', []):
+            if re.search(pattern, message, re.IGNORECASE):
+                matched.append(ttp_id)
+                break
+    return matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--patterns", type=int, default=600, help="minimum number of TTP patterns")
+    parser.add_argument("--messages", type=int, default=1000, help="number of log messages to scan")
+    parser.add_argument("--attack-ratio", type=float, default=0.05)
+    args = parser.parse_args()
+
+    patterns = build_patterns(args.patterns)
+    messages = build_messages(patterns, args.messages, args.attack_ratio)
+
+    start = time.perf_counter()
+    matcher = TTPMatcher(patterns)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fast = [matcher.match(m) for m in messages]
+    fast_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    slow = [naive_match(patterns, m) for m in messages]
+    slow_time = time.perf_counter() - start
+
+    if fast != slow:
+        mismatches = sum(1 for a, b in zip(fast, slow) if a != b)
+        print(f"❌ {mismatches} messages matched differently")
+        return 1
+
+    print("=" * 70)
+    print("📊 TTP MATCHER BENCHMARK")
+    print("=" * 70)
+    print(f"Techniques:          {len(patterns)}")
+    print(f"Patterns:            {len(matcher)} ({len(matcher.unfiltered)} without literal prefilter)")
+    print(f"Messages:            {len(messages)}")
+    print(f"Matcher build time:  {build_time * 1000:.1f} ms")
+    print(f"re.search loop:      {slow_time:.3f} s  ({len(messages) / slow_time:,.0f} msg/s)")
+    print(f"TTPMatcher:          {fast_time:.3f} s  ({len(messages) / fast_time:,.0f} msg/s)")
+    print(f"Speedup:             {slow_time / fast_time:.1f}x")
+    print("✅ Results identical")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
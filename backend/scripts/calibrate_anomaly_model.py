@@ -0,0 +1,75 @@
+"""
+Calibrate anomaly score normalization and threshold on a reference corpus
+Writes anomaly_calibration.json next to the models in MODELS_DIR so that
+every AIEngine.analyze() call uses the same fixed threshold, independent of
+batch size
+
+Usage:
+    python scripts/calibrate_anomaly_model.py --corpus reference_logs.txt
+    python scripts/calibrate_anomaly_model.py --from-db 50000
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def load_corpus(path: Path, limit: int) -> list:
+    """One message per line"""
+    messages = []
+    with open(path, 'r', errors='ignore') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                messages.append(line)
+                if limit and len(messages) >= limit:
+                    break
+    return messages
+
+
+def sample_database(sample_size: int) -> list:
+    """Random sample of stored messages from DuckDB"""
+    from services.storage_service import StorageService
+
+    rows = StorageService.query_logs(
+        f"SELECT message FROM logs WHERE message IS NOT NULL USING SAMPLE {int(sample_size)} ROWS"
+    )
+    return [row[0] for row in rows if row[0]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate anomaly thresholds for Project Quorum")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--corpus", type=Path, help="text file with one reference log message per line")
+    source.add_argument("--from-db", type=int, metavar="N", help="sample N stored messages from DuckDB")
+    parser.add_argument("--contamination", type=float, default=0.1,
+                        help="expected share of anomalies in the reference corpus (default: 0.1)")
+    parser.add_argument("--limit", type=int, default=0, help="maximum corpus lines to read (0 = all)")
+    args = parser.parse_args()
+
+    if not 0 < args.contamination < 1:
+        print("❌ --contamination must be between 0 and 1")
+        return 1
+
+    messages = load_corpus(args.corpus, args.limit) if args.corpus else sample_database(args.from_db)
+    if not messages:
+        print("❌ Reference corpus is empty")
+        return 1
+
+    from services.ai_engine import AIEngine, CALIBRATION_FILE
+
+    print(f"📐 Calibrating on {len(messages)} reference messages...")
+    engine = AIEngine()
+    calibration = engine.calibrate(messages, contamination=args.contamination)
+
+    print(f"✅ Threshold: {calibration['threshold']:.6f}")
+    print(f"   Ensemble range: [{calibration['ensemble']['min']:.6f}, {calibration['ensemble']['max']:.6f}]")
+    print(f"   MSE range:      [{calibration['mse']['min']:.6f}, {calibration['mse']['max']:.6f}]")
+    print(f"💾 Saved to {engine.model_dir / CALIBRATION_FILE}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
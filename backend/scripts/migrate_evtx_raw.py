@@ -0,0 +1,50 @@
+"""
+Convert EVTX events stored as XML by older versions to the canonical raw text
+the EVTX reader stores now, so re-importing those files is deduplicated
+against them instead of storing every event a second time
+
+The original record XML of migrated rows is replaced, and stored XML events
+that duplicate an event imported again since the upgrade are deleted. This
+cannot be undone: stop the server and back up the database file first.
+
+Usage:
+    python scripts/migrate_evtx_raw.py            # count the rows that would change
+    python scripts/migrate_evtx_raw.py --yes      # migrate them
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate stored EVTX raw XML to the canonical form")
+    parser.add_argument("--yes", action="store_true",
+                        help="rewrite the rows (irreversible; back up the database first)")
+    parser.add_argument("--batch-size", type=int, default=10_000, help="rows converted per batch")
+    args = parser.parse_args()
+
+    from config import DB_PATH
+    from services.storage_service import StorageService
+
+    pending = StorageService.query_logs(
+        "SELECT COUNT(*) FROM logs WHERE process LIKE 'EventID_%' AND raw LIKE '<Event%'"
+    )[0][0]
+    if not pending:
+        print("✅ No EVTX events stored as XML")
+        return 0
+
+    if not args.yes:
+        print(f"ℹ️ {pending} EVTX events are stored as XML in {DB_PATH}")
+        print("   Back up the database file, then run again with --yes to migrate them")
+        return 0
+
+    migrated = StorageService.migrate_evtx_raw(batch_size=args.batch_size)
+    print(f"✅ Migrated {migrated} EVTX events ({pending - migrated} unreadable ones left unchanged)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,26 @@
-import joblib
+import json
 import numpy as np
-import pandas as pd
+import polars as pl
+from datetime import datetime
 from pathlib import Path
 import re
-import tensorflow as tf
-from pyod.models.combination import aom
 
-from config import MODELS_DIR
+from config import MODELS_DIR, AI_BATCH_SIZE
+
+CALIBRATION_FILE = "anomaly_calibration.json"
+
+FEATURE_NAMES = [
+    'has_ip', 'ip_count', 'has_port', 'has_error', 'has_hex', 'has_suspicious_cmd',
+    'message_length', 'special_char_ratio', 'digit_ratio', 'uppercase_ratio',
+]
+
+# Same patterns as SecurityFeatureExtractor, in Rust regex syntax for Polars
+_IP_RE = r'\b(?:\d{1,3}\.){3}\d{1,3}\b'
+_PORT_RE = r':(\d{1,5})\b'
+_ERROR_RE = r'(?i)\b(error|fail|denied|unauthorized|forbidden|critical)\b'
+_HEX_RE = r'\b0x[0-9a-fA-F]+\b'
+_SUSPICIOUS_CMD_RE = r'(?i)\b(wget|curl|nc|bash|powershell|cmd|eval|exec)\b'
+
 
 class SecurityFeatureExtractor:
     def __init__(self):
@@ -32,22 +46,88 @@ class SecurityFeatureExtractor:
             'uppercase_ratio': sum(1 for c in message if c.isupper()) / max(len(message), 1),
         }
 
+    def extract_batch(self, messages) -> np.ndarray:
+        """
+        Compute the extract() features for a whole column at once with Polars
+        string kernels. Returns an (n, 10) float64 matrix in FEATURE_NAMES order.
+        
+        The character-class ratios use ASCII classes, which equal str.isalnum /
+        isdigit / isupper only for ASCII text; the (rare) non-ASCII rows are
+        recomputed with extract() so values stay identical to the per-message path.
+        """
+        if not isinstance(messages, pl.Series):
+            messages = pl.Series("message", [m if isinstance(m, str) else "" for m in messages], dtype=pl.Utf8)
+        column = pl.col("message")
+
+        def ratio(pattern: str) -> pl.Expr:
+            return column.str.count_matches(pattern).cast(pl.Float64) / pl.max_horizontal(
+                column.str.len_bytes(), pl.lit(1, dtype=pl.UInt32)
+            ).cast(pl.Float64)
+
+        frame = pl.DataFrame({"message": messages.fill_null("")}).select([
+            column.str.contains(_IP_RE).cast(pl.Float64).alias('has_ip'),
+            column.str.count_matches(_IP_RE).cast(pl.Float64).alias('ip_count'),
+            column.str.contains(_PORT_RE).cast(pl.Float64).alias('has_port'),
+            column.str.contains(_ERROR_RE).cast(pl.Float64).alias('has_error'),
+            column.str.contains(_HEX_RE).cast(pl.Float64).alias('has_hex'),
+            column.str.contains(_SUSPICIOUS_CMD_RE).cast(pl.Float64).alias('has_suspicious_cmd'),
+            column.str.len_chars().cast(pl.Float64).alias('message_length'),
+            ratio(r'[^A-Za-z0-9]').alias('special_char_ratio'),
+            ratio(r'[0-9]').alias('digit_ratio'),
+            ratio(r'[A-Z]').alias('uppercase_ratio'),
+            column.str.contains(r'[^\x00-\x7F]').alias('_non_ascii'),
+        ])
+
+        features = frame.select(FEATURE_NAMES).to_numpy().astype(np.float64, copy=False)
+
+        non_ascii = np.flatnonzero(frame['_non_ascii'].to_numpy())
+        if non_ascii.size:
+            raw = messages.fill_null("")
+            for idx in non_ascii:
+                features[idx] = list(self.extract(raw[int(idx)]).values())
+
+        return features
+
+
+def _tflite_interpreter(model_path: Path):
+    """TFLite interpreter from tflite_runtime if installed, else from full TensorFlow"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=str(model_path))
+
+
 class AIEngine:
-    """Embedded TinyML & PyOD anomaly detection"""
+    """
+    Embedded TinyML & PyOD anomaly detection
+    The models (and TensorFlow / PyOD) are loaded on first use or by load(), so
+    importing this module or creating an engine costs no model start-up time
+    """
 
-    def __init__(self, model_dir: Path = None):
+    def __init__(self, model_dir: Path = None, batch_size: int = None):
         self.model_dir = model_dir or MODELS_DIR
+        self.batch_size = batch_size or AI_BATCH_SIZE
         self.extractor = SecurityFeatureExtractor()
-        
-        # Load models
+        self.loaded = False
+        self.calibration = self._load_calibration()
+
+    def load(self):
+        """Load the PyOD models, vectorizer, scaler and TFLite autoencoder (once)"""
+        if self.loaded:
+            return
+
         try:
+            import joblib
+
             self.iforest = joblib.load(self.model_dir / "iforest_model.pkl")
             self.lof = joblib.load(self.model_dir / "lof_model.pkl")
             self.vectorizer = joblib.load(self.model_dir / "tfidf_vectorizer (1).pkl")
             self.scaler = joblib.load(self.model_dir / "security_features_scaler.pkl")
             
             # Load TFLite model
-            self.interpreter = tf.lite.Interpreter(model_path=str(self.model_dir / "autoencoder.tflite"))
+            self.interpreter = _tflite_interpreter(self.model_dir / "autoencoder.tflite")
             self.interpreter.allocate_tensors()
             self.input_details = self.interpreter.get_input_details()
             self.output_details = self.interpreter.get_output_details()
@@ -56,41 +136,73 @@ class AIEngine:
         except Exception as e:
             raise RuntimeError(f"❌ Model files not found or failed to load from {self.model_dir}: {e}")
 
+        self.loaded = True
+
+    def _load_calibration(self):
+        """Load fixed score normalization and threshold fitted by calibrate()"""
+        calibration_path = self.model_dir / CALIBRATION_FILE
+        if not calibration_path.exists():
+            print(f"⚠️ No {CALIBRATION_FILE} in {self.model_dir} - falling back to per-batch thresholds")
+            return None
+
+        with open(calibration_path, 'r') as f:
+            return json.load(f)
+
+    def calibrate(self, messages: list, contamination: float = 0.1, save: bool = True) -> dict:
+        """
+        Fit score normalization and the anomaly threshold on a reference corpus
+        The result is stored next to the models and applied by every later analyze() call
+        """
+        if not messages:
+            raise ValueError("Calibration requires a non-empty reference corpus")
+
+        ensemble_scores, mse_scores = self._raw_scores(messages)
+        calibration = {
+            "ensemble": {"min": float(np.min(ensemble_scores)), "max": float(np.max(ensemble_scores))},
+            "mse": {"min": float(np.min(mse_scores)), "max": float(np.max(mse_scores))},
+            "contamination": contamination,
+            "reference_size": len(messages),
+            "calibrated_at": datetime.now().isoformat(),
+        }
+
+        final_scores = self._combine_scores(ensemble_scores, mse_scores, calibration)
+        calibration["threshold"] = float(np.percentile(final_scores, 100 * (1 - contamination)))
+
+        if save:
+            with open(self.model_dir / CALIBRATION_FILE, 'w') as f:
+                json.dump(calibration, f, indent=2)
+
+        self.calibration = calibration
+        return calibration
+
+    @staticmethod
+    def _combine_scores(ensemble_scores: np.ndarray, mse_scores: np.ndarray, calibration: dict) -> np.ndarray:
+        """Average of min-max normalized scores, using the reference corpus range"""
+        def normalize(scores, bounds):
+            return (scores - bounds["min"]) / max(bounds["max"] - bounds["min"], 1e-12)
+
+        return (normalize(ensemble_scores, calibration["ensemble"]) + normalize(mse_scores, calibration["mse"])) / 2
+
     def analyze(self, messages: list) -> dict:
         """
         Perform anomaly detection on log messages
+        Messages are scored as vectorized matrices of at most batch_size rows
         Returns: {"anomalies": [...], "scores": [...]}
         """
         if not messages:
             return {"anomalies": [], "scores": [], "total_analyzed": 0, "anomaly_count": 0}
 
-        # 1. Feature Engineering
-        X_tfidf = self.vectorizer.transform(messages).toarray()
-        
-        security_features = [list(self.extractor.extract(msg).values()) for msg in messages]
-        X_security = np.array(security_features)
-        X_security_scaled = self.scaler.transform(X_security)
-        
-        X_combined = np.hstack([X_tfidf, X_security_scaled]).astype(np.float32)
-
-        # 2. Ensemble Prediction (IForest + LOF)
-        iforest_scores = self.iforest.decision_function(X_combined)
-        lof_scores = self.lof.decision_function(X_combined)
-        scores_matrix = np.column_stack([iforest_scores, lof_scores])
-        ensemble_scores = aom(scores_matrix, n_buckets=2)
-        
-        # 3. Autoencoder Prediction (TFLite)
-        self.interpreter.set_tensor(self.input_details[0]['index'], X_combined)
-        self.interpreter.invoke()
-        reconstructed = self.interpreter.get_tensor(self.output_details[0]['index'])
-        mse_scores = np.mean(np.square(X_combined - reconstructed), axis=1)
+        ensemble_scores, mse_scores = self._raw_scores(messages)
 
         # 4. Combine and format results
-        # Using a simple average of normalized scores for a final score
-        final_scores = (ensemble_scores / np.max(ensemble_scores) + mse_scores / np.max(mse_scores)) / 2
-        
-        # Using a percentile-based threshold for anomalies
-        threshold = np.percentile(final_scores, 90) 
+        if self.calibration:
+            # Fixed normalization and threshold: a message scores the same in any batch
+            final_scores = self._combine_scores(ensemble_scores, mse_scores, self.calibration)
+            threshold = self.calibration["threshold"]
+        else:
+            # Uncalibrated fallback: normalize by and threshold on this batch
+            final_scores = (ensemble_scores / np.max(ensemble_scores) + mse_scores / np.max(mse_scores)) / 2
+            threshold = np.percentile(final_scores, 90)
         predictions = (final_scores > threshold).astype(int)
 
         anomalies = []
@@ -108,4 +220,67 @@ class AIEngine:
             "scores": final_scores.tolist(),
             "total_analyzed": len(messages),
             "anomaly_count": len(anomalies)
-        }
\ No newline at end of file
+        }
+
+    def _raw_scores(self, messages: list):
+        """Raw ensemble and autoencoder scores, computed in batches of at most batch_size"""
+        self.load()
+        ensemble_chunks, mse_chunks = [], []
+        for start in range(0, len(messages), self.batch_size):
+            ensemble_scores, mse_scores = self._score_batch(messages[start:start + self.batch_size])
+            ensemble_chunks.append(ensemble_scores)
+            mse_chunks.append(mse_scores)
+
+        return np.concatenate(ensemble_chunks), np.concatenate(mse_chunks)
+
+    def _score_batch(self, messages: list):
+        """Raw ensemble and autoencoder scores for one batch of messages"""
+        from pyod.models.combination import aom
+
+        # 1. Feature Engineering
+        X_combined = self._build_features(messages)
+
+        # 2. Ensemble Prediction (IForest + LOF)
+        iforest_scores = self.iforest.decision_function(X_combined)
+        lof_scores = self.lof.decision_function(X_combined)
+        scores_matrix = np.column_stack([iforest_scores, lof_scores])
+        ensemble_scores = aom(scores_matrix, n_buckets=2)
+        
+        # 3. Autoencoder Prediction (TFLite)
+        residual = self._reconstruct(X_combined)
+        np.subtract(X_combined, residual, out=residual)
+        np.square(residual, out=residual)
+        mse_scores = residual.mean(axis=1)
+
+        return ensemble_scores, mse_scores
+
+    def _build_features(self, messages: list) -> np.ndarray:
+        """
+        Dense float32 [TF-IDF | scaled security features] matrix for one batch
+        The TF-IDF block stays sparse until its non-zeros are scattered straight
+        into the float32 output, so peak memory is one batch_size x n_features
+        float32 matrix instead of several float64 copies
+        """
+        X_tfidf = self.vectorizer.transform(messages).tocoo()
+
+        X_security_scaled = self.scaler.transform(self.extractor.extract_batch(messages))
+
+        n_tfidf = X_tfidf.shape[1]
+        X_combined = np.zeros((len(messages), n_tfidf + X_security_scaled.shape[1]), dtype=np.float32)
+        X_combined[X_tfidf.row, X_tfidf.col] = X_tfidf.data
+        X_combined[:, n_tfidf:] = X_security_scaled
+
+        return X_combined
+
+    def _reconstruct(self, X: np.ndarray) -> np.ndarray:
+        """Run the TFLite autoencoder on a whole batch, resizing its input tensor as needed"""
+        input_index = self.input_details[0]['index']
+        if tuple(self.input_details[0]['shape']) != X.shape:
+            self.interpreter.resize_tensor_input(input_index, X.shape)
+            self.interpreter.allocate_tensors()
+            self.input_details = self.interpreter.get_input_details()
+            self.output_details = self.interpreter.get_output_details()
+
+        self.interpreter.set_tensor(input_index, X)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output_details[0]['index'])
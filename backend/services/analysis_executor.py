@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from config import ANALYSIS_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# DetectionEngine of the current worker process (loaded once by _init_worker)
+_worker_engine = None
+# Why _init_worker failed, if it did
+_worker_error = None
+
+
+def _init_worker():
+    """Load rules, threat intel and AI models once per worker process"""
+    global _worker_engine, _worker_error
+    try:
+        from core.detection_engine import DetectionEngine
+        _worker_engine = DetectionEngine()
+        _worker_engine.ai_engine.load()
+    except Exception as e:
+        # Raising here would kill the worker and the job would only see
+        # BrokenProcessPool; every task reports the cause instead
+        _worker_error = f"{type(e).__name__}: {e}"
+
+
+def _check_worker() -> int:
+    if _worker_error is not None:
+        raise RuntimeError(f"Analysis worker could not load detection content: {_worker_error}")
+    return os.getpid()
+
+
+def _analyze_chunk(log_entries: List[Dict]) -> List[Dict]:
+    _check_worker()
+    return _worker_engine.batch_analyze(log_entries)
+
+
+class AnalysisExecutor:
+    """
+    Process pools for CPU-bound log analysis.
+    Chunks are scored in worker processes so the event loop stays free for API
+    requests; results come back to the caller, which stays the single DB writer.
+    There is one pool per detection content version: a job holds the pool of the
+    version it started with, and a pool whose content was replaced (e.g. by a SOUP
+    update) is shut down once its last job has released it, so running jobs are
+    never cancelled by a newer one.
+    """
+
+    def __init__(self, workers: int = None):
+        self.workers = workers or ANALYSIS_WORKERS or max((os.cpu_count() or 2) - 1, 1)
+        self._pools: Dict[str, ProcessPoolExecutor] = {}
+        # Jobs currently holding each version's pool
+        self._users: Dict[str, int] = {}
+        # Detection content version new jobs and warm-up use
+        self.version = None
+
+    def use_version(self, version: str):
+        """Make version the current detection content; pools of older versions are retired"""
+        if self.version is not None and self.version != version:
+            logger.info(f"🔄 Detection content changed ({self.version} -> {version}), new jobs use fresh analysis workers")
+        self.version = version
+        self._retire_unused()
+
+    @contextmanager
+    def using(self, version: str):
+        """Hold the workers of a detection content version for the duration of one job"""
+        self.use_version(version)
+        self._users[version] = self._users.get(version, 0) + 1
+        try:
+            yield
+        finally:
+            self._users[version] -= 1
+            self._retire_unused()
+
+    def _retire_unused(self):
+        for version in list(self._pools):
+            if version != self.version and not self._users.get(version):
+                logger.info(f"♻️ Retiring analysis workers of detection version {version}")
+                self.discard(version)
+
+    @property
+    def max_in_flight(self) -> int:
+        """Chunks worth queueing so that no worker idles while results are written"""
+        return self.workers * 2
+
+    def _get_pool(self, version: str = None) -> ProcessPoolExecutor:
+        version = version or self.version
+        pool = self._pools.get(version)
+        if pool is None:
+            # spawn: workers must not inherit the parent's DuckDB handle or event loop
+            pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+            self._pools[version] = pool
+            logger.info(f"⚙️ Started analysis pool with {self.workers} workers")
+        return pool
+
+    async def warm_up(self):
+        """Start every worker now, so the first analysis job does not wait for model loading"""
+        loop = asyncio.get_running_loop()
+        version = self.version
+        pool = self._get_pool(version)
+        start = time.perf_counter()
+        try:
+            # Each new worker runs _init_worker before its first task
+            await asyncio.gather(*(loop.run_in_executor(pool, _check_worker) for _ in range(self.workers)))
+        except Exception:
+            # Drop the failed pool unless a job started on it meanwhile: discarding
+            # it then would fail that job's chunks; the job reports the error itself
+            if self._pools.get(version) is pool and not self._users.get(version):
+                self.discard(version)
+            raise
+        logger.info(f"🔥 Analysis workers ready in {time.perf_counter() - start:.1f}s")
+
+    def submit(self, log_entries: List[Dict], version: str = None) -> asyncio.Future:
+        """Schedule batch_analyze for a chunk on the version's pool; await the returned future"""
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._get_pool(version), _analyze_chunk, log_entries)
+
+    def discard(self, version: str):
+        """
+        Drop a version's pool (retired, or broken by a dead worker).
+        Chunks already submitted still finish; the workers exit afterwards.
+        """
+        pool = self._pools.pop(version, None)
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def shutdown(self):
+        """Stop all workers and cancel queued chunks (application shutdown)"""
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        self._pools.clear()
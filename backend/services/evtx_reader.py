@@ -0,0 +1,370 @@
+import json
+import mmap
+import os
+import struct
+import datetime as dt
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import polars as pl
+
+from config import PARSE_CHUNK_BYTES
+
+# EVTX layout: a 4 KB file header followed by independent 64 KB chunks. Each chunk
+# carries its own string and template tables, so chunks can be parsed in any process.
+EVTX_HEADER_SIZE = 0x1000
+EVTX_CHUNK_SIZE = 0x10000
+EVTX_CHUNK_MAGIC = b'ElfChnk\x00'
+
+# Chunks parsed into one DataFrame (bounds memory like PARSE_CHUNK_BYTES does for text)
+EVTX_CHUNKS_PER_FRAME = max(PARSE_CHUNK_BYTES // EVTX_CHUNK_SIZE, 1)
+
+EVTX_SCHEMA = {
+    "timestamp": pl.Datetime(time_unit="ms"),
+    "host": pl.Utf8,
+    "process": pl.Utf8,
+    "pid": pl.Int64,
+    "message": pl.Utf8,
+    "raw": pl.Utf8,
+    "event_id": pl.Int64,
+    "attributes": pl.Utf8,
+}
+
+EVENT_NS = '{http://schemas.microsoft.com/win/2004/08/events/event}'
+
+
+def _import_evtx():
+    try:
+        import Evtx.Evtx as evtx
+        import Evtx.Nodes as nodes
+    except ImportError:
+        raise ImportError("python-evtx not installed: pip install python-evtx")
+    return evtx, nodes
+
+
+def chunk_count(file_path: Path) -> int:
+    """Chunks declared in the file header (limited to what the file actually holds)"""
+    with open(file_path, "rb") as f:
+        header = f.read(EVTX_HEADER_SIZE)
+        size = os.fstat(f.fileno()).st_size
+    if len(header) < 0x2C:
+        return 0
+    declared = struct.unpack_from("<H", header, 0x2A)[0]
+    return min(declared, max(size - EVTX_HEADER_SIZE, 0) // EVTX_CHUNK_SIZE)
+
+
+def chunk_ranges(file_path: Path, parts: int) -> List[Tuple[int, int]]:
+    """Split a file's chunks into at most `parts` contiguous [first, last) ranges"""
+    total = chunk_count(file_path)
+    if total == 0:
+        return [(0, 0)]
+    span = min(-(-total // max(parts, 1)), EVTX_CHUNKS_PER_FRAME)
+    return [(first, min(first + span, total)) for first in range(0, total, span)]
+
+
+def iter_frames(file_path: Path, first_chunk: int = 0, last_chunk: Optional[int] = None) -> Iterator[pl.DataFrame]:
+    """
+    Parse chunks [first_chunk, last_chunk) of an EVTX file into DataFrames of
+    EVTX_SCHEMA. System fields and EventData name/value pairs are decoded straight
+    from each record's binary XML substitutions; records that cannot be read that
+    way are rendered to XML instead.
+    """
+    evtx, nodes = _import_evtx()
+    total = chunk_count(file_path)
+    last_chunk = total if last_chunk is None else min(last_chunk, total)
+    if first_chunk >= last_chunk:
+        return
+
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        rows = []
+        # Field plans by template (GUID, size): templates repeat in every chunk
+        plans = {}
+        for index in range(first_chunk, last_chunk):
+            chunk_offset = EVTX_HEADER_SIZE + index * EVTX_CHUNK_SIZE
+            if buf[chunk_offset:chunk_offset + len(EVTX_CHUNK_MAGIC)] != EVTX_CHUNK_MAGIC:
+                continue
+
+            reader = _ChunkReader(buf, evtx.ChunkHeader(buf, chunk_offset), nodes, plans)
+            for record_offset in reader.record_offsets():
+                try:
+                    rows.append(reader.record_row(record_offset))
+                except Exception:
+                    try:
+                        rows.append(_record_row_xml(evtx.Record(buf, record_offset, reader.chunk)))
+                    except Exception:
+                        continue
+
+            if (index - first_chunk + 1) % EVTX_CHUNKS_PER_FRAME == 0 and rows:
+                yield _rows_to_frame(rows)
+                rows = []
+
+        if rows:
+            yield _rows_to_frame(rows)
+
+
+# Attributes of System elements kept as fields (Provider Name is stored as 'Provider')
+SYSTEM_ATTRIBUTES = ("Name", "SystemTime", "ProcessID", "ThreadID", "Qualifiers")
+
+RECORD_MAGIC = 0x00002a2a
+FILETIME_EPOCH_OFFSET = 11644473600
+
+
+class _ChunkReader:
+    """
+    Reads the records of one chunk. Each template is flattened once into a field
+    plan (python-evtx parses its binary XML); records then only decode their
+    substitution values, which is where the per-record data lives.
+    """
+
+    def __init__(self, buf, chunk, nodes, plans: Dict):
+        self.buf = buf
+        self.chunk = chunk
+        self.nodes = nodes
+        self.offset = chunk.offset()
+        self.plans = plans
+
+    def record_offsets(self) -> Iterator[int]:
+        end = self.offset + struct.unpack_from("<I", self.buf, self.offset + 0x30)[0]
+        offset = self.offset + 0x200
+        while offset < min(end, self.offset + EVTX_CHUNK_SIZE):
+            magic, size = struct.unpack_from("<II", self.buf, offset)
+            if magic != RECORD_MAGIC or size == 0 or size > EVTX_CHUNK_SIZE:
+                return
+            yield offset
+            offset += size
+
+    def record_row(self, record_offset: int) -> Dict:
+        system, data = {}, {}
+        self._walk_root(record_offset + 0x18, system, data)
+        if "EventID" not in system:
+            raise ValueError("record template without System/EventID")
+        written = _filetime(struct.unpack_from("<Q", self.buf, record_offset + 0x10)[0])
+        return {"system": system, "data": data, "written": written}
+
+    def _walk_root(self, root_offset: int, system: Dict, data: Dict):
+        """Fill system / data from a binary XML root (nested roots in substitutions recurse)"""
+        buf = self.buf
+        instance = root_offset + 4 if buf[root_offset] & 0x0F == 0x0F else root_offset
+        template_offset = struct.unpack_from("<I", buf, instance + 6)[0]
+        template = self.offset + template_offset
+        data_length = struct.unpack_from("<I", buf, template + 0x14)[0]
+
+        # Substitution array: after the template instance, and after the template
+        # itself when it is defined inline (first use within the chunk)
+        subs_offset = instance + 10
+        if template_offset > instance - self.offset:
+            subs_offset = template + 0x18 + data_length
+
+        key = (bytes(buf[template + 4:template + 0x14]), data_length)
+        plan = self.plans.get(key)
+        if plan is None:
+            root = self.nodes.RootNode(buf, root_offset, self.chunk, None)
+            plan = self.plans[key] = _template_plan(root.template(), self.nodes)
+
+        count = struct.unpack_from("<I", buf, subs_offset)[0]
+        value_offset = subs_offset + 4 + count * 4
+        subs = []
+        for i in range(count):
+            size, type_ = struct.unpack_from("<HB", buf, subs_offset + 4 + i * 4)
+            subs.append((type_, value_offset, size))
+            value_offset += size
+
+        def resolve(entry_sources):
+            values = []
+            for kind, value in entry_sources:
+                if kind == "lit":
+                    values.append(value)
+                    continue
+                type_, offset, size = subs[value]
+                if type_ == 0x21:
+                    self._walk_root(offset, system, data)
+                elif type_ == 0x11 and len(entry_sources) == 1:
+                    return _filetime(struct.unpack_from("<Q", buf, offset)[0])
+                else:
+                    values.append(self._value_string(type_, offset, size))
+            return "".join(values) if values else None
+
+        for parent, tag, attribute, name, value in plan:
+            if parent == "System":
+                if attribute is None:
+                    system[tag] = resolve(value)
+                elif attribute in SYSTEM_ATTRIBUTES:
+                    system[tag if attribute == "Name" else attribute] = resolve(value)
+            elif attribute is None:
+                resolved = resolve(value)
+                if resolved is None:
+                    # Element whose content is a nested root (e.g. <Event> holding EventData)
+                    continue
+                if tag == "Data":
+                    key = resolve(name) if name else f"Data{len(data)}"
+                else:
+                    key = tag
+                data[key] = resolved
+
+    def _value_string(self, type_: int, offset: int, size: int) -> str:
+        """Text of a substitution value, as python-evtx renders it in XML"""
+        buf = self.buf
+        if type_ == 0x00:
+            return ""
+        if type_ == 0x01:
+            return bytes(buf[offset:offset + size]).decode("utf-16-le", errors="replace").rstrip("\x00")
+        if type_ in INTEGER_FORMATS:
+            return str(struct.unpack_from(INTEGER_FORMATS[type_], buf, offset)[0])
+        if type_ == 0x14:
+            return "0x%08x" % struct.unpack_from("<I", buf, offset)[0]
+        if type_ == 0x15:
+            return "0x%016x" % struct.unpack_from("<Q", buf, offset)[0]
+        if type_ == 0x11:
+            return _filetime(struct.unpack_from("<Q", buf, offset)[0]).isoformat(" ")
+        if type_ == 0x13:
+            revision, count = buf[offset], buf[offset + 1]
+            authority = int.from_bytes(buf[offset + 2:offset + 8], "big")
+            parts = struct.unpack_from(f"<{count}I", buf, offset + 8)
+            return "-".join(["S", str(revision), str(authority)] + [str(part) for part in parts])
+        return self.nodes.get_variant_value(buf, offset, self.chunk, None, type_, length=size).string()
+
+
+# struct formats of the integer substitution types
+INTEGER_FORMATS = {
+    0x03: "<b", 0x04: "<B", 0x05: "<h", 0x06: "<H",
+    0x07: "<i", 0x08: "<I", 0x09: "<q", 0x0a: "<Q",
+}
+
+
+def _filetime(value: int) -> dt.datetime:
+    if value == 0:
+        return dt.datetime.min
+    try:
+        return dt.datetime.fromtimestamp(value * 1e-7 - FILETIME_EPOCH_OFFSET, dt.timezone.utc)
+    except (ValueError, OSError, OverflowError):
+        return dt.datetime.min
+
+
+def _template_plan(template, nodes) -> List[Tuple]:
+    """
+    Flatten a template into (parent tag, tag, attribute, name sources, value sources)
+    entries. Sources are ('lit', text) or ('sub', substitution index).
+    """
+    plan = []
+
+    def sources(node) -> List[Tuple]:
+        if isinstance(node, nodes.ValueNode):
+            return [("lit", node.children()[0].string())]
+        if isinstance(node, (nodes.NormalSubstitutionNode, nodes.ConditionalSubstitutionNode)):
+            return [("sub", node.index())]
+        if isinstance(node, nodes.CDataSectionNode):
+            return [("lit", node.cdata())]
+        return []
+
+    def walk(node, parent: str):
+        if not isinstance(node, nodes.OpenStartElementNode):
+            return
+        tag = node.tag_name()
+        name, value = None, []
+        for child in node.children():
+            if isinstance(child, nodes.AttributeNode):
+                attribute = child.attribute_name().string()
+                attribute_sources = sources(child.attribute_value())
+                if attribute == "Name":
+                    name = attribute_sources
+                if parent == "System":
+                    plan.append((parent, tag, attribute, None, attribute_sources))
+            elif isinstance(child, nodes.OpenStartElementNode):
+                walk(child, tag)
+            else:
+                value.extend(sources(child))
+        if value:
+            plan.append((parent, tag, None, name, value))
+
+    for child in template.children():
+        walk(child, "")
+    return plan
+
+
+def _record_row_xml(record) -> Dict:
+    """Fallback: render the record to XML and read the same fields from it"""
+    system, data = _xml_fields(record.xml())
+    return {"system": system, "data": data, "written": record.timestamp()}
+
+
+def _xml_fields(xml: str) -> Tuple[Dict, Dict]:
+    """System fields and EventData / UserData name-value pairs of an event's XML"""
+    import xml.etree.ElementTree as ET
+
+    root = ET.fromstring(xml)
+    system, data = {}, {}
+    for element in root.find(f"{EVENT_NS}System"):
+        tag = element.tag.replace(EVENT_NS, "")
+        if element.text:
+            system[tag] = element.text
+        for attribute, value in element.attrib.items():
+            if attribute in SYSTEM_ATTRIBUTES:
+                system[tag if attribute == "Name" else attribute] = value
+    for section in (root.find(f"{EVENT_NS}EventData"), root.find(f"{EVENT_NS}UserData")):
+        for element in section.iter() if section is not None else []:
+            if element is section or len(element):
+                continue
+            tag = element.tag.split("}")[-1]
+            key = element.get("Name") or (tag if tag != "Data" else f"Data{len(data)}")
+            data[key] = element.text or ""
+    return system, data
+
+
+def _raw(system: Dict, data: Dict) -> str:
+    """
+    Stored raw text of an event, the input of its dedup hash. Canonical (sorted
+    keys, empty System fields dropped, values as python-evtx renders them in XML)
+    so the binary and XML code paths produce the same text for the same event.
+    """
+    system = {key: value for key, value in system.items() if value is not None and value != ""}
+    return json.dumps({"System": system, "EventData": data}, default=str, sort_keys=True)
+
+
+def raw_from_xml(xml: str) -> Optional[str]:
+    """Canonical raw text for an event stored as XML by older versions, or None if unreadable"""
+    try:
+        return _raw(*_xml_fields(xml))
+    except Exception:
+        return None
+
+
+def _utc_naive(value) -> Optional[dt.datetime]:
+    if isinstance(value, dt.datetime) and value != dt.datetime.min:
+        return value.astimezone(dt.timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+    return None
+
+
+def _rows_to_frame(rows: List[Dict]) -> pl.DataFrame:
+    timestamps, hosts, event_ids, pids, messages, raws, attributes = [], [], [], [], [], [], []
+    for row in rows:
+        system, data = row["system"], row["data"]
+        created = system.get("SystemTime")
+        if isinstance(created, str):
+            try:
+                created = dt.datetime.fromisoformat(created.replace("Z", "+00:00"))
+            except ValueError:
+                created = None
+        timestamps.append(_utc_naive(created) or _utc_naive(row["written"]))
+        hosts.append(system.get("Computer"))
+        event_ids.append(system.get("EventID"))
+        pids.append(system.get("ProcessID"))
+        messages.append(" ".join(f"{key}={value}" for key, value in data.items()))
+        raws.append(_raw(system, data))
+        attributes.append(json.dumps(data, default=str))
+
+    df = pl.DataFrame({
+        "timestamp": pl.Series(timestamps, dtype=pl.Datetime("us")),
+        "host": hosts,
+        "event_id": pl.Series(event_ids, dtype=pl.Utf8),
+        "pid": pl.Series(pids, dtype=pl.Utf8),
+        "message": messages,
+        "raw": raws,
+        "attributes": attributes,
+    })
+    event_id = pl.col("event_id").cast(pl.Int64, strict=False)
+    return df.with_columns([
+        event_id.alias("event_id"),
+        pl.col("pid").cast(pl.Int64, strict=False),
+        # Kept from the XML parser: rules and dashboards key on EventID_<id>
+        pl.format("EventID_{}", event_id).alias("process"),
+    ]).select([pl.col(name).cast(dtype) for name, dtype in EVTX_SCHEMA.items()])
@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import polars as pl
+
+from config import DATA_DIR, INGEST_WORKERS
+from services import evtx_reader
+from services.job_manager import Job, job_manager
+from services.storage_service import StorageService
+
+logger = logging.getLogger(__name__)
+
+# Parsed frames waiting for the DuckDB writer (Arrow IPC, one file per chunk)
+STAGING_DIR = DATA_DIR / "staging"
+
+
+def _stage_file(file_path: str, staging_dir: str, evtx_chunks: Optional[Tuple[int, int]] = None) -> Dict:
+    """
+    Worker: detect format, parse and hash one file (or one chunk range of an EVTX
+    file) chunk by chunk, writing each bounded frame to an Arrow IPC file. Errors
+    are returned, not raised, so one bad file never stops the rest of the batch.
+    """
+    from services.parser_service import LogParser
+
+    result = {"file": file_path, "rows": 0, "staged": [], "error": None}
+    try:
+        os.makedirs(staging_dir, exist_ok=True)
+        for i, df in enumerate(LogParser.iter_file_frames(Path(file_path), evtx_chunks=evtx_chunks)):
+            staged_path = os.path.join(staging_dir, f"{i:06d}.arrow")
+            StorageService.add_content_hash(df).write_ipc(staged_path)
+            result["staged"].append(staged_path)
+            result["rows"] += df.shape[0]
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def _count_file(file_path: str) -> Dict:
+    """Worker: number of rows a file parses into"""
+    from services.parser_service import LogParser
+
+    try:
+        rows = sum(df.shape[0] for df in LogParser.iter_file_frames(Path(file_path)))
+        return {"file": file_path, "rows": rows, "error": None}
+    except Exception as e:
+        return {"file": file_path, "rows": 0, "error": f"{type(e).__name__}: {e}"}
+
+
+class IngestService:
+    """
+    Parallel multi-file ingest.
+    Files are parsed and hashed in a process pool; the staged frames are inserted
+    by the calling process, which stays the only DuckDB writer. EVTX files are
+    split into ranges of their 64 KB chunks so one large log keeps every worker
+    busy. Per-file progress and errors are reported on an ingest job
+    (see services/job_manager.py).
+    """
+
+    def __init__(self, workers: int = None):
+        self.workers = workers or INGEST_WORKERS or max((os.cpu_count() or 2) - 1, 1)
+        self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"⚙️ Started ingest pool with {self.workers} workers")
+        return self._pool
+
+    async def _run_all(self, fn, *args_per_file):
+        """Yield worker results as files finish, in completion order"""
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        futures = [loop.run_in_executor(pool, fn, *args) for args in zip(*args_per_file)]
+        for future in asyncio.as_completed(futures):
+            yield await future
+
+    async def count_rows(self, filepaths: List[Path]) -> Dict[str, Dict]:
+        """Parse files in parallel without storing them; returns rows / error per file"""
+        counts = {}
+        async for result in self._run_all(_count_file, [str(p) for p in filepaths]):
+            counts[Path(result["file"]).name] = result
+        return counts
+
+    async def ingest(self, filepaths: List[Path], job: Job) -> Dict:
+        """
+        Parse, hash and store files, reporting per-file status on job.details['files'].
+        Returns a summary with rows parsed and inserted and the files that failed.
+        """
+        files = {p.name: {"status": "parsing", "rows": 0, "inserted": 0, "error": None} for p in filepaths}
+        job.details = {"files": files, "rows": 0, "inserted": 0}
+        job_manager.start(job, len(filepaths), message=f"Parsing {len(filepaths)} files...", unit="files")
+
+        STAGING_DIR.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix="ingest_", dir=STAGING_DIR))
+        tasks = self._plan_tasks(filepaths)
+        parts_left = {}
+        for task_path, _ in tasks:
+            parts_left[task_path.name] = parts_left.get(task_path.name, 0) + 1
+        finished = 0
+
+        try:
+            async for result in self._run_all(
+                _stage_file,
+                [str(task_path) for task_path, _ in tasks],
+                [str(staging / str(i)) for i in range(len(tasks))],
+                [chunks for _, chunks in tasks]
+            ):
+                name = Path(result["file"]).name
+                entry = files[name]
+                entry["rows"] += result["rows"]
+                job.details["rows"] += result["rows"]
+
+                if result["error"]:
+                    entry.update(status="failed", error=result["error"])
+                    logger.warning(f"⚠️ Ingest failed for {name}: {result['error']}")
+                else:
+                    if entry["status"] != "failed":
+                        entry["status"] = "storing"
+                    job_manager.update(job, message=f"Storing {name}...")
+                    try:
+                        with job_manager.stage(job, "write"):
+                            for staged_path in result["staged"]:
+                                inserted = await asyncio.to_thread(self._insert_staged, staged_path)
+                                entry["inserted"] += inserted
+                                job.details["inserted"] += inserted
+                    except Exception as e:
+                        entry.update(status="failed", error=f"{type(e).__name__}: {e}")
+                        logger.error(f"❌ Storing {name} failed: {e}")
+
+                parts_left[name] -= 1
+                if parts_left[name] == 0:
+                    if entry["status"] != "failed":
+                        entry["status"] = "stored"
+                    finished += 1
+                job_manager.update(job, processed=finished, message=f"Processed {finished}/{len(filepaths)} files")
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                # A worker died (e.g. out of memory); start a fresh pool next time
+                self.shutdown()
+            job_manager.finish(job, f"Error: {str(e)}", failed=True)
+            raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        failed = {name: entry["error"] for name, entry in files.items() if entry["status"] == "failed"}
+        job_manager.finish(
+            job,
+            f"Stored {job.details['inserted']} new rows from {len(filepaths) - len(failed)} files"
+            + (f", {len(failed)} failed" if failed else ""),
+            failed=bool(failed) and len(failed) == len(filepaths)
+        )
+
+        return {
+            "files_stored": len(filepaths) - len(failed),
+            "total_rows": job.details["rows"],
+            "rows_inserted": job.details["inserted"],
+            "files": [name for name, entry in files.items() if entry["status"] == "stored"],
+            "failed_files": failed
+        }
+
+    def _plan_tasks(self, filepaths: List[Path]) -> List[Tuple[Path, Optional[Tuple[int, int]]]]:
+        """One task per file, or per chunk range for EVTX files"""
+        from services.parser_service import LogParser
+
+        tasks = []
+        for path in filepaths:
+            try:
+                if LogParser.is_evtx(path):
+                    tasks.extend((path, chunks) for chunks in evtx_reader.chunk_ranges(path, self.workers))
+                    continue
+            except OSError:
+                pass  # reported by the worker that fails to open it
+            tasks.append((path, None))
+        return tasks
+
+    @staticmethod
+    def _insert_staged(staged_path: str) -> int:
+        df = pl.read_ipc(staged_path, memory_map=False)
+        os.remove(staged_path)
+        return StorageService.insert_polars_df(df)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+
+# Finished jobs kept for the jobs API; older ones are dropped
+MAX_FINISHED_JOBS = 50
+
+# Seconds between SSE keep-alive comments while a job has no news
+SSE_KEEPALIVE_SECONDS = 15
+
+
+@dataclass
+class Job:
+    """State of one background job; updated only from the event loop"""
+    job_id: str
+    kind: str
+    scope: Optional[str] = None
+    status: str = "pending"  # pending, running, completed, failed
+    message: str = ""
+    total: int = 0
+    processed: int = 0
+    unit: str = "rows"  # what total / processed count
+    threats_found: int = 0
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+    # Job-specific state, e.g. per-file progress of an ingest job
+    details: Dict = field(default_factory=dict)
+    version: int = 0
+    _resumed_from: int = 0
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def to_dict(self) -> Dict:
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        rate = (self.processed - self._resumed_from) / elapsed if elapsed > 0 else 0.0
+        remaining = max(self.total - self.processed, 0)
+
+        if self.status == "completed":
+            progress = 100.0
+        else:
+            progress = round(self.processed / self.total * 100, 2) if self.total else 0.0
+
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "scope": self.scope,
+            "status": self.status,
+            "progress": progress,
+            "message": self.message,
+            "total": self.total,
+            "processed": self.processed,
+            "unit": self.unit,
+            "threats_found": self.threats_found,
+            "rate_per_sec": round(rate, 1),
+            "eta_seconds": round(remaining / rate, 1) if rate and not self.finished else None,
+            "elapsed_seconds": round(elapsed, 2),
+            "stage_seconds": {name: round(seconds, 3) for name, seconds in self.stage_seconds.items()},
+            "details": self.details,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    In-memory registry of background jobs (per process).
+    Jobs report progress through update()/stage(); clients read a snapshot or
+    follow a Server-Sent Events stream that is pushed on every update.
+    """
+
+    def __init__(self, max_finished: int = MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+
+    def create(self, kind: str, scope: str = None, message: str = "Queued") -> Job:
+        job = Job(job_id=uuid.uuid4().hex[:12], kind=kind, scope=scope, message=message)
+        self._jobs[job.job_id] = job
+        self._prune()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self, kind: str = None) -> List[Job]:
+        """Newest first"""
+        return [job for job in reversed(self._jobs.values()) if kind is None or job.kind == kind]
+
+    def active(self, kind: str, scope: str = None) -> Optional[Job]:
+        """Unfinished job of this kind and scope, if any"""
+        for job in self._jobs.values():
+            if job.kind == kind and job.scope == scope and not job.finished:
+                return job
+        return None
+
+    def latest(self, kind: str = None) -> Optional[Job]:
+        jobs = self.list(kind)
+        return jobs[0] if jobs else None
+
+    def start(self, job: Job, total: int, processed: int = 0, message: str = "", unit: str = "rows"):
+        job.status = "running"
+        job.unit = unit
+        job.started_at = time.time()
+        job.total = total
+        job.processed = job._resumed_from = processed
+        self.update(job, message=message)
+
+    def update(self, job: Job, **fields):
+        """Set job fields (processed, threats_found, message, ...) and notify subscribers"""
+        for name, value in fields.items():
+            setattr(job, name, value)
+        job.version += 1
+        job._changed.set()
+        job._changed = asyncio.Event()
+
+    def finish(self, job: Job, message: str, failed: bool = False):
+        job.finished_at = time.time()
+        self.update(job, status="failed" if failed else "completed", message=message)
+
+    @contextmanager
+    def stage(self, job: Job, name: str):
+        """Accumulate wall-clock time spent in a pipeline stage (read, score, write, ...)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            job.stage_seconds[name] = job.stage_seconds.get(name, 0.0) + time.perf_counter() - start
+
+    async def events(self, job: Job) -> AsyncIterator[str]:
+        """Server-Sent Events: one 'progress' event per update, ending when the job finishes"""
+        seen = -1
+        while True:
+            changed = job._changed
+            if job.version != seen:
+                seen = job.version
+                yield f"event: progress\ndata: {json.dumps(job.to_dict())}\n\n"
+                if job.finished:
+                    return
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[job_id]
+
+
+job_manager = JobManager()
@@ -1,19 +1,202 @@
 import polars as pl
 import re
+import io
+import csv
+import hashlib
+import itertools
+import bz2
+import gzip
+import lzma
+import tarfile
 from pathlib import Path
-from typing import List, Optional
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
 import datetime as dt
 import json
-import pandas as pd
+import os
+from config import PARSE_CHUNK_BYTES, JSON_MAPPING_PROFILE, CSV_MAPPING_PROFILE, CSV_SCHEMA_DIR
+from services import evtx_reader
 
-SYSLOG_REGEX = re.compile(
-    r'^(?P<month>\w{3})\s+(?P<day>\d{1,2})\s+(?P<time>\d{2}:\d{2}:\d{2})\s+(?P<host>\S+)\s+(?P<proc>\S+?)(?:[[](?P<pid>\d+)]])?:\s+(?P<msg>.*)$'
-)
+BSD_SYSLOG_PATTERN = r'^(?P<month>\w{3})\s+(?P<day>\d{1,2})\s+(?P<time>\d{2}:\d{2}:\d{2})\s+(?P<host>\S+)\s+(?P<proc>\S+?)(?:\[(?P<pid>\d+)\]\])?:\s+(?P<msg>.*)$'
+RFC5424_PATTERN = r'<(?P<prio>\d{1,3})>(?P<ver>\d{1,2})? (?P<timestamp>\S+) (?P<hostname>\S+) (?P<app_name>\S+) (?P<proc_id>\S+) (?P<msg_id>\S+) (?P<structured_data>-|\[.*\]) (?P<msg>.*)'
+
+SYSLOG_REGEX = re.compile(BSD_SYSLOG_PATTERN)
+RFC5424_REGEX = re.compile(RFC5424_PATTERN)
 
-RFC5424_REGEX = re.compile(
-    r'<(?P<prio>\d{1,3})>(?P<ver>\d{1,2})? (?P<timestamp>\S+) (?P<hostname>\S+) (?P<app_name>\S+) (?P<proc_id>\S+) (?P<msg_id>\S+) (?P<structured_data>-|\[.*\]) (?P<msg>.*)'
+# Characters Python's str.isspace() accepts; Rust's whitespace class lacks \x1c-\x1f
+PY_WHITESPACE = (
+    '\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004'
+    '\u2005\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000'
 )
 
+
+def _rust_pattern(pattern: str) -> str:
+    """Same regex for Polars' Rust engine, with Python's meaning of \\s and \\S"""
+    return pattern.replace(r'\s', r'[\s\x1c-\x1f]').replace(r'\S', r'[^\s\x1c-\x1f]')
+
+
+# Vectorized equivalents of SYSLOG_REGEX.match / RFC5424_REGEX.match
+BSD_SYSLOG_RUST = _rust_pattern(BSD_SYSLOG_PATTERN)
+RFC5424_RUST = '^' + _rust_pattern(RFC5424_PATTERN)
+
+# RFC5424 timestamp layouts tried in order; offsets are converted to UTC
+RFC5424_TZ_FORMATS = ['%Y-%m-%dT%H:%M:%S%.f%:z', '%Y-%m-%d %H:%M:%S%.f%:z']
+RFC5424_NAIVE_FORMATS = ['%Y-%m-%dT%H:%M:%S%.f', '%Y-%m-%d %H:%M:%S%.f', '%Y-%m-%d']
+
+# Unified columns produced by every parser (source_file is added per file)
+LOG_SCHEMA = {
+    "timestamp": pl.Datetime(time_unit="ms"),
+    "host": pl.Utf8,
+    "process": pl.Utf8,
+    "pid": pl.Int64,
+    "message": pl.Utf8,
+    "raw": pl.Utf8,
+}
+
+# JSON field paths (dotted = nested object) tried in order for each unified column.
+# Fields not mapped to a column are kept as JSON in the attributes column.
+JSON_MAPPING_PROFILES = {
+    "default": {
+        "timestamp": ["timestamp", "time", "@timestamp"],
+        "host": ["host", "hostname"],
+        "process": ["process", "program", "app"],
+        "pid": ["pid"],
+        "message": ["message", "msg"],
+    },
+    # Elastic Common Schema (Beats, Elastic Agent, Logstash ECS output)
+    "ecs": {
+        "timestamp": ["@timestamp"],
+        "host": ["host.name", "host.hostname", "agent.hostname"],
+        "process": ["process.name", "service.name", "event.provider"],
+        "pid": ["process.pid"],
+        "message": ["message", "event.original"],
+    },
+    # Windows events forwarded as JSON (NXLog, Winlogbeat raw, WEF collectors)
+    "windows": {
+        "timestamp": ["EventTime", "TimeCreated", "TimeGenerated"],
+        "host": ["Hostname", "Computer", "ComputerName"],
+        "process": ["SourceName", "ProviderName", "Channel"],
+        "pid": ["ProcessID", "ExecutionProcessID"],
+        "message": ["Message"],
+    },
+    # Docker json-file logging driver
+    "docker": {
+        "timestamp": ["time"],
+        "host": ["attrs.host"],
+        "process": ["attrs.tag", "attrs.name"],
+        "pid": [],
+        "message": ["log"],
+    },
+}
+
+# CSV headers (matched case-insensitively) for each unified column. timestamp lists
+# column groups joined with spaces (e.g. LogHub's Date + Time); 'signature' headers
+# only help auto-detection. Without a message column, message is "header=value" pairs.
+CSV_MAPPING_PROFILES = {
+    "default": {
+        "timestamp": [["timestamp"], ["datetime"], ["date", "time"], ["time"], ["@timestamp"]],
+        "host": ["host", "hostname"],
+        "process": ["process", "program", "app"],
+        "pid": ["pid"],
+        "message": ["message", "msg"],
+        "signature": [],
+    },
+    # Firewall exports (Palo Alto, FortiGate, pfSense, generic src/dst/action CSVs)
+    "firewall": {
+        "timestamp": [["receive time"], ["generate time"], ["timestamp"], ["datetime"], ["date", "time"], ["time"]],
+        "host": ["device name", "devname", "serial #", "device", "host", "hostname"],
+        "process": ["application", "app", "service"],
+        "pid": [],
+        "message": [],
+        "signature": ["source address", "destination address", "src", "dst", "src_ip", "dst_ip", "srcip",
+                      "dstip", "source port", "destination port", "srcport", "dstport", "action", "rule",
+                      "policyid", "proto", "protocol"],
+    },
+    # Web proxy logs (W3C / Squid / Zscaler style CSV exports)
+    "proxy": {
+        "timestamp": [["date", "time"], ["datetime"], ["timestamp"], ["time"]],
+        "host": ["s-computername", "s-ip", "proxy"],
+        "process": ["cs-method", "method"],
+        "pid": [],
+        "message": [],
+        "signature": ["c-ip", "client_ip", "cs-host", "cs-uri-stem", "cs-uri-query", "url", "sc-status",
+                      "status", "cs(user-agent)", "user_agent", "cs-username", "s-action", "bytes"],
+    },
+    # LogHub structured logs (*.log_structured.csv, see training_model_code/enhanced_training.py)
+    "loghub": {
+        "timestamp": [["timestamp"], ["month", "date", "time"], ["date", "time"], ["time"]],
+        "host": ["node", "host"],
+        "process": ["component"],
+        "pid": ["pid"],
+        "message": ["content"],
+        "signature": ["lineid", "level", "eventid", "eventtemplate"],
+    },
+}
+
+# Timestamp layouts of CSV exports not covered by ISO-8601 (decimal commas are
+# normalized first); the year-less ones get the current year like BSD syslog
+CSV_TIMESTAMP_FORMATS = [
+    '%y%m%d %H%M%S', '%a %b %d %H:%M:%S %Y', '%Y-%m-%d-%H.%M.%S%.f', '%y/%m/%d %H:%M:%S%.f',
+    '%Y/%m/%d %H:%M:%S%.f', '%m/%d/%Y %H:%M:%S%.f', '%d/%b/%Y:%H:%M:%S',
+]
+CSV_YEARLESS_FORMATS = ['%Y %b %d %H:%M:%S%.f', '%Y %m-%d %H:%M:%S%.f']
+
+CSV_DELIMITERS = ',;\t|'
+
+# Files taken as CSV by name; other text is CSV only if its header is made of identifiers
+CSV_SUFFIXES = ('.csv', '.tsv')
+COMPRESSED_SUFFIXES = ('.gz', '.bz2', '.xz', '.zst', '.zstd')
+CSV_HEADER_NAME = re.compile(r'^[A-Za-z_@#][\w.\-@#/]*$')
+
+# Dtype names stored in the CSV schema cache
+CSV_DTYPES = {str(dtype): dtype for dtype in (pl.Int64, pl.Float64, pl.Boolean, pl.Utf8)}
+
+# Timestamp and host columns are always read as text so zero-padded values
+# (LogHub's 081109, a firewall serial 001) survive type inference
+CSV_TEXT_COLUMNS = {
+    c for mapping in CSV_MAPPING_PROFILES.values() for c in mapping["host"] + sum(mapping["timestamp"], [])
+}
+
+# Inferred CSV schemas by header signature, shared by ingest workers of this process
+_csv_schema_cache = {}
+
+# Magic bytes of the compressed containers decompressed transparently while parsing
+GZIP_MAGIC = b'\x1f\x8b'
+BZIP2_MAGIC = b'BZh'
+XZ_MAGIC = b'\xfd7zXZ\x00'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+EVTX_MAGIC = b'ElfFile\x00'
+
+
+def _open_zstd(stream: BinaryIO) -> BinaryIO:
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstandard not installed: pip install zstandard")
+    reader = zstandard.ZstdDecompressor().stream_reader(stream, read_across_frames=True)
+    return io.BufferedReader(reader, buffer_size=1 << 20)
+
+
+DECOMPRESSORS = [
+    (GZIP_MAGIC, lambda stream: gzip.GzipFile(fileobj=stream, mode='rb')),
+    (BZIP2_MAGIC, lambda stream: bz2.BZ2File(stream, mode='rb')),
+    (XZ_MAGIC, lambda stream: lzma.LZMAFile(stream, mode='rb')),
+    (ZSTD_MAGIC, _open_zstd),
+]
+
+
+def _decompressed(stream: BinaryIO) -> BinaryIO:
+    """Wrap a peekable binary stream in the decompressor its magic bytes call for"""
+    magic = stream.peek(8)[:8]
+    for signature, opener in DECOMPRESSORS:
+        if magic.startswith(signature):
+            return opener(stream)
+    return stream
+
+
+def _is_tar(header: bytes) -> bool:
+    return len(header) >= 262 and header[257:262] == b'ustar'
+
+
 MONTH_MAP = {
     'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
     'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
@@ -44,55 +227,93 @@ class LogParser:
 
     @staticmethod
     def parse_syslog_lines(lines: List[str]) -> pl.DataFrame:
-        records = []
-        for ln in lines:
-            ln = ln.strip()
-            if not ln:
-                continue
+        """
+        Parse BSD and RFC5424 syslog lines; lines matching neither are kept as plain messages.
+        Regex extraction and timestamp parsing run as Polars expressions over the whole
+        batch (in Rust, across cores) instead of per line in Python.
+        """
+        df = pl.DataFrame({"raw": pl.Series(lines, dtype=pl.Utf8)}).select(
+            pl.col("raw").str.strip_chars(PY_WHITESPACE)
+        ).filter(pl.col("raw") != "")
 
-            rec = None
-            bsd_match = SYSLOG_REGEX.match(ln)
-            rfc_match = RFC5424_REGEX.match(ln)
-
-            if bsd_match:
-                ts = LogParser._make_timestamp_from_syslog(bsd_match.group('month'), bsd_match.group('day'), bsd_match.group('time'))
-                rec = {
-                    "timestamp": ts,
-                    "host": bsd_match.group("host"),
-                    "process": bsd_match.group("proc"),
-                    "pid": int(bsd_match.group("pid")) if bsd_match.group("pid") else None,
-                    "message": bsd_match.group("msg"),
-                    "raw": ln
-                }
-            elif rfc_match:
-                try:
-                    ts = pd.to_datetime(rfc_match.group('timestamp'))
-                except:
-                    ts = None
-                rec = {
-                    "timestamp": ts,
-                    "host": rfc_match.group("hostname"),
-                    "process": rfc_match.group("app_name"),
-                    "pid": rfc_match.group("proc_id"),
-                    "message": rfc_match.group("msg"),
-                    "raw": ln
-                }
-            else:
-                rec = {
-                    "timestamp": None, "host": None, "process": None,
-                    "pid": None, "message": ln, "raw": ln
-                }
-            records.append(rec)
+        if df.is_empty():
+            return pl.DataFrame(schema=LOG_SCHEMA)
 
-        df = pl.DataFrame(records).with_columns([
-            pl.col("timestamp").cast(pl.Datetime(time_unit = "ms")),
-            pl.col("host").cast(pl.Utf8),
-            pl.col("process").cast(pl.Utf8),
-            pl.col("pid").cast(pl.Int64),
-            pl.col("message").cast(pl.Utf8),
-            pl.col("raw").cast(pl.Utf8),
+        df = df.with_columns([
+            pl.col("raw").str.extract_groups(BSD_SYSLOG_RUST).alias("bsd"),
+            pl.col("raw").str.extract_groups(RFC5424_RUST).alias("rfc"),
+        ])
+        bsd = pl.col("bsd").struct.field
+        rfc = pl.col("rfc").struct.field
+        is_bsd = bsd("month").is_not_null()
+        is_rfc = is_bsd.not_() & rfc("prio").is_not_null()
+
+        now = dt.datetime.now()
+        df = df.with_columns([
+            pl.when(is_bsd).then(LogParser._bsd_timestamp(bsd, now))
+              .when(is_rfc).then(LogParser._rfc5424_timestamp(rfc("timestamp")))
+              .alias("timestamp"),
+            pl.when(is_bsd).then(bsd("host")).when(is_rfc).then(rfc("hostname")).alias("host"),
+            pl.when(is_bsd).then(bsd("proc")).when(is_rfc).then(rfc("app_name")).alias("process"),
+            pl.when(is_bsd).then(bsd("pid")).when(is_rfc).then(rfc("proc_id"))
+              .cast(pl.Int64, strict=False).alias("pid"),
+            pl.when(is_bsd).then(bsd("msg")).when(is_rfc).then(rfc("msg"))
+              .otherwise(pl.col("raw")).alias("message"),
+            # Day/time/pid written with non-ASCII digits: the Rust kernels only read ASCII
+            (is_bsd & pl.concat_str([bsd("day"), bsd("time"), bsd("pid").fill_null("")])
+                .str.contains(r'^[\x00-\x7f]*$').not_()).alias("_slow"),
+        ])
+
+        if df["_slow"].any():
+            df = LogParser._fix_unicode_digit_rows(df)
+
+        return df.select([pl.col(name).cast(dtype) for name, dtype in LOG_SCHEMA.items()])
+
+    @staticmethod
+    def _bsd_timestamp(bsd, now: dt.datetime) -> pl.Expr:
+        """BSD syslog has no year: use the current one, like _make_timestamp_from_syslog"""
+        month = bsd("month").replace(MONTH_MAP, default=now.month).cast(pl.Utf8).str.zfill(2)
+        stamp = pl.format("{}-{}-{} {}", pl.lit(str(now.year)), month, bsd("day").str.zfill(2), bsd("time"))
+        # strptime would roll second 60 over into the next minute; datetime() rejects it
+        valid_time = bsd("time").str.contains(r'^([01][0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9]$')
+        return pl.when(valid_time).then(
+            stamp.str.strptime(pl.Datetime("ms"), "%Y-%m-%d %H:%M:%S", strict=False)
+        )
+
+    @staticmethod
+    def _rfc5424_timestamp(timestamp: pl.Expr) -> pl.Expr:
+        """First layout that parses wins; offset timestamps become UTC, '-' (nil) becomes null"""
+        with_offset = timestamp.str.replace(r'[Zz]$', '+00:00')
+        candidates = [
+            with_offset.str.strptime(pl.Datetime("us", "UTC"), fmt, strict=False)
+                .dt.replace_time_zone(None)
+            for fmt in RFC5424_TZ_FORMATS
+        ] + [
+            timestamp.str.strptime(pl.Datetime("us"), fmt, strict=False)
+            for fmt in RFC5424_NAIVE_FORMATS
+        ]
+        return pl.coalesce(candidates).cast(pl.Datetime("ms"))
+
+    @staticmethod
+    def _fix_unicode_digit_rows(df: pl.DataFrame) -> pl.DataFrame:
+        """Recompute timestamp and pid in Python for the (rare) rows flagged _slow"""
+        timestamps = df["timestamp"].to_list()
+        pids = df["pid"].to_list()
+        slow = df.with_row_count("_idx").filter(pl.col("_slow")).select([
+            "_idx",
+            pl.col("bsd").struct.field("month"),
+            pl.col("bsd").struct.field("day"),
+            pl.col("bsd").struct.field("time"),
+            pl.col("bsd").struct.field("pid"),
+        ])
+        for idx, month, day, time, pid in slow.iter_rows():
+            timestamps[idx] = LogParser._make_timestamp_from_syslog(month, day, time)
+            pids[idx] = int(pid) if pid else None
+
+        return df.with_columns([
+            pl.Series("timestamp", timestamps, dtype=pl.Datetime("ms")),
+            pl.Series("pid", pids, dtype=pl.Int64),
         ])
-        return df
 
     @staticmethod
     def parse_generic_text(lines: List[str]) -> pl.DataFrame:
@@ -116,6 +337,9 @@ class LogParser:
                 "pid": None, "message": ln, "raw": ln
             })
 
+        if not records:
+            return pl.DataFrame(schema=LOG_SCHEMA)
+
         df = pl.DataFrame(records).with_columns([
             pl.col("timestamp").cast(pl.Datetime(time_unit = "ms")),
             pl.col("host").cast(pl.Utf8),
@@ -127,97 +351,508 @@ class LogParser:
         return df
 
     @staticmethod
-    def parse_json_logs(lines: List[str]) -> pl.DataFrame:
-        records = []
-        for line in lines:
-            try:
-                log = json.loads(line)
-                records.append({
-                    "timestamp": pd.to_datetime(log.get("timestamp")),
-                    "host": log.get("host", "unknown"),
-                    "process": log.get("process", "unknown"),
-                    "pid": None,
-                    "message": log.get("message", line),
-                    "raw": line
-                })
-            except json.JSONDecodeError:
+    def parse_json_logs(lines: List[str], profile: str = None) -> pl.DataFrame:
+        """
+        Parse JSON lines with Polars' native NDJSON reader and map fields to the
+        unified columns using a profile from JSON_MAPPING_PROFILES ('auto' picks
+        the best match). Unmapped fields are kept as JSON in the attributes column.
+        """
+        lines = [line for line in lines if line.strip()]
+        if not lines:
+            return pl.DataFrame(schema={**LOG_SCHEMA, "attributes": pl.Utf8})
+
+        try:
+            df = pl.read_ndjson(io.BytesIO("\n".join(lines).encode("utf-8")))
+            raw = lines
+        except Exception:
+            # Malformed lines or conflicting types: parse line by line, skipping bad lines
+            df, raw = LogParser._parse_json_lines(lines)
+
+        if df.is_empty():
+            return pl.DataFrame(schema={**LOG_SCHEMA, "attributes": pl.Utf8})
+
+        profile = profile or JSON_MAPPING_PROFILE
+        if profile == "auto":
+            profile = LogParser.detect_json_profile(df.schema)
+        mapping = JSON_MAPPING_PROFILES[profile]
+
+        # Every candidate path present in the batch; rows fall back to the next one
+        fields = {name: LogParser._json_fields(df.schema, mapping[name]) for name in LOG_SCHEMA if name != "raw"}
+        mapped = {path for paths in fields.values() for path in paths}
+        # Mapped nested fields (host.name, ...) are removed from their parent objects,
+        # and parents left empty are dropped, so attributes does not repeat them
+        consumed = {tuple(path.split(".")) for path in mapped if path not in df.columns}
+        extra = []
+        for name in df.columns:
+            if name in mapped:
                 continue
+            remaining = LogParser._json_without(pl.col(name), df.schema[name], consumed, (name,))
+            if remaining is not None:
+                extra.append(remaining.alias(name))
 
-        df = pl.DataFrame(records).with_columns([
-            pl.col("timestamp").cast(pl.Datetime(time_unit = "ms")),
-            pl.col("host").cast(pl.Utf8),
-            pl.col("process").cast(pl.Utf8),
-            pl.col("pid").cast(pl.Int64),
-            pl.col("message").cast(pl.Utf8),
-            pl.col("raw").cast(pl.Utf8),
+        def col(path):
+            parent, *children = path.split(".") if path not in df.columns else [path]
+            expr = pl.col(parent)
+            for child in children:
+                expr = expr.struct.field(child)
+            return expr
+
+        def text(name):
+            return [col(path).cast(pl.Utf8) for path in fields[name]]
+
+        timestamps = [
+            LogParser._json_timestamp(col(path), LogParser._json_dtype(df.schema, path))
+            for path in fields["timestamp"]
+        ]
+        messages = [value.str.strip_chars_end("\r\n") for value in text("message")]
+        df = df.with_columns(pl.Series("raw", raw, dtype=pl.Utf8)).select([
+            (pl.coalesce(timestamps) if timestamps else pl.lit(None, dtype=pl.Datetime("ms"))).alias("timestamp"),
+            pl.coalesce(text("host") + [pl.lit("unknown")]).alias("host"),
+            pl.coalesce(text("process") + [pl.lit("unknown")]).alias("process"),
+            (pl.coalesce([col(path).cast(pl.Int64, strict=False) for path in fields["pid"]])
+                if fields["pid"] else pl.lit(None)).alias("pid"),
+            # Lines without any message field keep the whole line, as before
+            pl.coalesce(messages + [pl.col("raw")]).alias("message"),
+            pl.col("raw"),
+            (pl.struct(extra).struct.json_encode() if extra else pl.lit(None)).alias("attributes"),
         ])
-        return df
+
+        return df.select(
+            [pl.col(name).cast(dtype) for name, dtype in LOG_SCHEMA.items()]
+            + [pl.col("attributes").cast(pl.Utf8)]
+        )
 
     @staticmethod
-    def parse_evtx_logs(file_path: Path) -> pl.DataFrame:
+    def _json_without(expr: pl.Expr, dtype, consumed: set, path: tuple) -> Optional[pl.Expr]:
+        """expr minus the consumed struct field paths below path; None if nothing is left"""
+        if not isinstance(dtype, pl.Struct) or not any(c[:len(path)] == path for c in consumed):
+            return expr
+        fields = []
+        for field in dtype.fields:
+            child = path + (field.name,)
+            if child in consumed:
+                continue
+            remaining = LogParser._json_without(expr.struct.field(field.name), field.dtype, consumed, child)
+            if remaining is not None:
+                fields.append(remaining.alias(field.name))
+        if len(fields) == len(dtype.fields):
+            return expr
+        return pl.struct(fields) if fields else None
+
+    @staticmethod
+    def detect_json_profile(schema) -> str:
+        """Mapping profile with the most fields present; ties go to 'default'"""
+        best, best_hits = "default", -1
+        for name, mapping in JSON_MAPPING_PROFILES.items():
+            hits = sum(
+                1 for paths in mapping.values() for path in paths
+                if LogParser._json_dtype(schema, path) is not None
+            )
+            if hits > best_hits:
+                best, best_hits = name, hits
+        return best
+
+    @staticmethod
+    def _json_dtype(schema, path: Optional[str]):
+        """Dtype of a (possibly dotted) field path if it holds a scalar, else None"""
+        if path is None:
+            return None
+        if path in schema:
+            dtype = schema[path]
+        else:
+            dtype = None
+            fields = schema
+            for part in path.split("."):
+                if not isinstance(fields, dict) or part not in fields:
+                    return None
+                dtype = fields[part]
+                fields = {f.name: f.dtype for f in dtype.fields} if isinstance(dtype, pl.Struct) else None
+        if isinstance(dtype, (pl.Struct, pl.List)) or dtype == pl.Null:
+            return None
+        return dtype
+
+    @staticmethod
+    def _json_fields(schema, paths: List[str]) -> List[str]:
+        return [path for path in paths if LogParser._json_dtype(schema, path) is not None]
+
+    @staticmethod
+    def _json_timestamp(value: Optional[pl.Expr], dtype) -> pl.Expr:
+        """ISO-8601 strings (offsets become UTC) or epoch seconds / milliseconds"""
+        if value is None:
+            return pl.lit(None, dtype=pl.Datetime("ms"))
+        if dtype == pl.Utf8:
+            epoch = value.str.contains(r'^\d+(\.\d+)?$')
+            return pl.when(epoch).then(
+                LogParser._json_timestamp(value.cast(pl.Float64, strict=False), pl.Float64)
+            ).otherwise(LogParser._rfc5424_timestamp(value))
+        if dtype in pl.NUMERIC_DTYPES:
+            # Epoch seconds unless the value is too large to be one (then milliseconds)
+            millis = pl.when(value.abs() > 1e11).then(value).otherwise(value * 1000)
+            return pl.from_epoch(millis.cast(pl.Int64), time_unit="ms")
+        return pl.lit(None, dtype=pl.Datetime("ms"))
+
+    @staticmethod
+    def _parse_json_lines(lines: List[str]) -> Tuple[pl.DataFrame, List[str]]:
+        """Per-line fallback for batches the native reader rejects"""
         try:
-            import Evtx.Evtx as evtx
-            import xml.etree.ElementTree as ET
+            import orjson
+            loads = orjson.loads
         except ImportError:
-            raise ImportError("python-evtx not installed: pip install python-evtx")
-        
-        records = []
-        with evtx.Evtx(str(file_path)) as log:
-            for record in log.records():
-                try:
-                    xml = record.xml()
-                    root = ET.fromstring(xml)
-                    ns = {'evt': 'http://schemas.microsoft.com/win/2004/08/events/event'}
-                    system = root.find('.//evt:System', ns)
-                    timestamp = system.find('.//evt:TimeCreated', ns).get('SystemTime')
-                    event_id = system.find('.//evt:EventID', ns).text
-                    computer = system.find('.//evt:Computer', ns).text
-                    event_data = root.find('.//evt:EventData', ns)
-                    message = ET.tostring(event_data, encoding='unicode') if event_data is not None else ""
-                    
-                    records.append({
-                        'timestamp': pd.to_datetime(timestamp), 'host': computer,
-                        'process': f'EventID_{event_id}', 'pid': None,
-                        'message': message, 'raw': xml
-                    })
-                except Exception:
-                    continue
-        
+            loads = json.loads
+
+        records, raw = [], []
+        for line in lines:
+            try:
+                record = loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                records.append(record)
+                raw.append(line)
+
         if not records:
+            return pl.DataFrame(), []
+
+        try:
+            return pl.from_dicts(records, infer_schema_length=None), raw
+        except Exception:
+            # A field with different types across lines: keep every value as text
+            records = [
+                {key: value if isinstance(value, str) or value is None else json.dumps(value)
+                 for key, value in record.items()}
+                for record in records
+            ]
+            keys = list(dict.fromkeys(key for record in records for key in record))
+            return pl.from_dicts(records, schema={key: pl.Utf8 for key in keys}), raw
+
+    @staticmethod
+    def parse_evtx_logs(file_path: Path) -> pl.DataFrame:
+        frames = list(evtx_reader.iter_frames(file_path))
+        if not frames:
             return pl.DataFrame()
+        return pl.concat(frames, how="vertical")
 
-        df = pl.DataFrame(records)
-        return df.select([
-            pl.col("timestamp").cast(pl.Datetime(time_unit="ms")),
-            pl.col("host").cast(pl.Utf8),
-            pl.col("process").cast(pl.Utf8),
-            pl.lit(None, dtype=pl.Int64).alias("pid"),
-            pl.col("message").cast(pl.Utf8),
-            pl.col("raw").cast(pl.Utf8),
+    @staticmethod
+    def open_log_streams(file_path: Path) -> Iterator[Tuple[str, BinaryIO]]:
+        """
+        Yield (source name, binary stream) for the log text in a file.
+        gzip, bz2, xz and zstd are decompressed on the fly (detected by magic bytes,
+        not extension) and tar archives yield one stream per member, also
+        decompressed, so nothing is expanded to disk first.
+        """
+        file_path = Path(file_path)
+
+        with open(file_path, "rb") as probe:
+            header = _decompressed(probe).read(512)
+
+        if header.startswith(EVTX_MAGIC):
+            print(f"[parser] skipping {file_path}: extract compressed EVTX files before ingest")
+            return
+
+        with open(file_path, "rb") as raw:
+            stream = _decompressed(raw)
+            if not _is_tar(header):
+                yield str(file_path), stream
+                return
+
+            with tarfile.open(fileobj=stream, mode="r|") as tar:
+                for member in tar:
+                    if not member.isfile():
+                        continue
+                    member_stream = _decompressed(tar.extractfile(member))
+                    if member_stream.peek(8)[:8].startswith(EVTX_MAGIC):
+                        print(f"[parser] skipping {file_path}!{member.name}: extract EVTX files before ingest")
+                        continue
+                    yield f"{file_path}!{member.name}", member_stream
+
+    @staticmethod
+    def iter_line_batches(source: Union[Path, BinaryIO], chunk_bytes: int = None) -> Iterator[List[str]]:
+        """
+        Read a file (or binary stream) in fixed-size chunks and yield its lines in batches.
+        Only complete lines are decoded; the partial line at the end of a chunk is
+        carried into the next one, so memory stays bounded by the chunk size.
+        """
+        if isinstance(source, (str, Path)):
+            with open(source, "rb") as f:
+                yield from LogParser.iter_line_batches(f, chunk_bytes)
+            return
+
+        chunk_bytes = chunk_bytes or PARSE_CHUNK_BYTES
+        carry = b""
+
+        while True:
+            chunk = source.read(chunk_bytes)
+            if not chunk:
+                break
+
+            data = carry + chunk
+            cut = data.rfind(b"\n")
+            if cut == -1:
+                # A single line longer than the chunk: keep reading
+                carry = data
+                continue
+
+            carry = data[cut + 1:]
+            yield data[:cut + 1].decode("utf-8", errors="ignore").splitlines()
+
+        if carry:
+            yield carry.decode("utf-8", errors="ignore").splitlines()
+
+    @staticmethod
+    def iter_csv_frames(batches: Iterator[List[str]], profile: str = None) -> Iterator[pl.DataFrame]:
+        """
+        Parse CSV line batches (the first line of the first batch is the header).
+        The column types inferred for a header are cached on disk by header
+        signature, so later files from the same kind of source skip inference.
+        """
+        batches = iter(batches)
+        first = [line for line in next(batches, []) if line.strip()]
+        if not first:
+            return
+
+        header = first[0]
+        delimiter = LogParser._csv_delimiter(first[:10])
+        signature = hashlib.sha256(f"{delimiter}\n{header.strip()}".encode("utf-8")).hexdigest()[:16]
+        schema = LogParser._load_csv_schema(signature)
+
+        for lines in itertools.chain([first[1:]], batches):
+            lines = [line for line in lines if line.strip()]
+            if not lines:
+                continue
+            df = None
+            if schema is not None:
+                try:
+                    df = LogParser._read_csv(header, lines, delimiter, schema=schema)
+                except Exception:
+                    # Same header, different types (e.g. a column that is no longer numeric)
+                    schema = None
+            if df is None:
+                df = LogParser._read_csv(header, lines, delimiter)
+                schema = {name: str(dtype) for name, dtype in df.schema.items()}
+                LogParser._save_csv_schema(signature, header, delimiter, schema)
+            yield LogParser.map_csv_frame(df, lines, profile)
+
+    @staticmethod
+    def _read_csv(header: str, lines: List[str], delimiter: str, schema: Dict[str, str] = None) -> pl.DataFrame:
+        data = io.BytesIO("\n".join([header] + lines).encode("utf-8"))
+        if schema is None:
+            names = next(csv.reader([header], delimiter=delimiter))
+            text = {name: pl.Utf8 for name in names if name.strip().lower() in CSV_TEXT_COLUMNS}
+            return pl.read_csv(data, separator=delimiter, dtypes=text, infer_schema_length=10_000,
+                               truncate_ragged_lines=True)
+        dtypes = {name: CSV_DTYPES.get(dtype, pl.Utf8) for name, dtype in schema.items()}
+        return pl.read_csv(data, separator=delimiter, dtypes=dtypes, infer_schema_length=0,
+                           truncate_ragged_lines=True)
+
+    @staticmethod
+    def map_csv_frame(df: pl.DataFrame, lines: List[str], profile: str = None) -> pl.DataFrame:
+        """Map CSV columns to the unified schema; unmapped columns go to attributes"""
+        profile = profile or CSV_MAPPING_PROFILE
+        if profile == "auto":
+            profile = LogParser.detect_csv_profile(df.columns)
+        mapping = CSV_MAPPING_PROFILES[profile]
+        columns = {name.strip().lower(): name for name in df.columns}
+
+        def column(candidates):
+            return next((columns[c] for c in candidates if c in columns), None)
+
+        time_group = next((g for g in mapping["timestamp"] if all(c in columns for c in g)), [])
+        time_columns = [columns[c] for c in time_group]
+        fields = {name: column(mapping[name]) for name in ("host", "process", "pid", "message")}
+        mapped = set(time_columns) | {name for name in fields.values() if name}
+        extra = [name for name in df.columns if name not in mapped]
+
+        if time_columns:
+            timestamp = LogParser._csv_timestamp(
+                pl.concat_str([pl.col(c).cast(pl.Utf8) for c in time_columns], separator=" ")
+            )
+        else:
+            timestamp = pl.lit(None, dtype=pl.Datetime("ms"))
+
+        if fields["message"]:
+            message = pl.col(fields["message"]).cast(pl.Utf8)
+        else:
+            message = pl.concat_str(
+                [pl.format(f"{name}={{}}", pl.col(name).cast(pl.Utf8).fill_null("")) for name in df.columns],
+                separator=" "
+            )
+
+        # Rows line up with lines unless a quoted field spanned several lines
+        raw = pl.Series("raw", lines, dtype=pl.Utf8) if len(lines) == df.height else None
+
+        df = df.select([
+            timestamp.alias("timestamp"),
+            (pl.col(fields["host"]).cast(pl.Utf8).fill_null("unknown") if fields["host"] else pl.lit("unknown"))
+                .alias("host"),
+            (pl.col(fields["process"]).cast(pl.Utf8).fill_null("unknown") if fields["process"] else pl.lit("unknown"))
+                .alias("process"),
+            (pl.col(fields["pid"]).cast(pl.Int64, strict=False) if fields["pid"] else pl.lit(None)).alias("pid"),
+            message.alias("message"),
+            pl.concat_str([pl.col(name).cast(pl.Utf8).fill_null("") for name in df.columns], separator=",")
+                .alias("raw"),
+            (pl.struct(extra).struct.json_encode() if extra else pl.lit(None)).alias("attributes"),
         ])
+        if raw is not None:
+            df = df.with_columns(raw)
+
+        return df.select(
+            [pl.col(name).cast(dtype) for name, dtype in LOG_SCHEMA.items()]
+            + [pl.col("attributes").cast(pl.Utf8)]
+        )
+
+    @staticmethod
+    def detect_csv_profile(header: List[str]) -> str:
+        """Mapping profile with the most header matches; ties go to 'default'"""
+        columns = {name.strip().lower() for name in header}
+        best, best_hits = "default", -1
+        for name, mapping in CSV_MAPPING_PROFILES.items():
+            candidates = {c for group in mapping["timestamp"] for c in group}
+            for key in ("host", "process", "pid", "message", "signature"):
+                candidates.update(mapping[key])
+            hits = len(columns & candidates)
+            if hits > best_hits:
+                best, best_hits = name, hits
+        return best
+
+    @staticmethod
+    def _csv_timestamp(value: pl.Expr) -> pl.Expr:
+        value = value.str.strip_chars().str.replace_all(r'(\d),(\d)', '$1.$2')
+        year = str(dt.datetime.now().year)
+        return pl.coalesce(
+            [LogParser._json_timestamp(value, pl.Utf8)]
+            + [value.str.strptime(pl.Datetime("us"), fmt, strict=False) for fmt in CSV_TIMESTAMP_FORMATS]
+            + [pl.format("{} {}", pl.lit(year), value).str.strptime(pl.Datetime("us"), fmt, strict=False)
+               for fmt in CSV_YEARLESS_FORMATS]
+        ).cast(pl.Datetime("ms"))
+
+    @staticmethod
+    def _csv_delimiter(sample_lines: List[str]) -> Optional[str]:
+        """Delimiter if the sample looks like a header plus rows of one width, else None"""
+        if len(sample_lines) < 2:
+            return None
+        try:
+            dialect = csv.Sniffer().sniff("\n".join(sample_lines), delimiters=CSV_DELIMITERS)
+        except csv.Error:
+            return None
+        rows = list(csv.reader(sample_lines, delimiter=dialect.delimiter))
+        header = rows[0]
+        if len(header) < 3 or any(not name.strip() or len(name) > 64 for name in header):
+            return None
+        if sum(len(row) == len(header) for row in rows[1:]) < 0.8 * (len(rows) - 1):
+            return None
+        return dialect.delimiter
+
+    @staticmethod
+    def _load_csv_schema(signature: str) -> Optional[Dict[str, str]]:
+        if signature not in _csv_schema_cache:
+            path = CSV_SCHEMA_DIR / f"{signature}.json"
+            try:
+                _csv_schema_cache[signature] = json.loads(path.read_text())["schema"]
+            except (OSError, ValueError, KeyError):
+                return None
+        return _csv_schema_cache[signature]
+
+    @staticmethod
+    def _save_csv_schema(signature: str, header: str, delimiter: str, schema: Dict[str, str]):
+        _csv_schema_cache[signature] = schema
+        try:
+            CSV_SCHEMA_DIR.mkdir(parents=True, exist_ok=True)
+            path = CSV_SCHEMA_DIR / f"{signature}.json"
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps({"header": header.strip(), "delimiter": delimiter, "schema": schema}))
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[parser] could not cache CSV schema {signature}: {e}")
+
+    @staticmethod
+    def _has_csv_name(source_name: Optional[str]) -> bool:
+        name = (source_name or "").lower()
+        for suffix in COMPRESSED_SUFFIXES:
+            if name.endswith(suffix):
+                name = name[:-len(suffix)]
+                break
+        return name.endswith(CSV_SUFFIXES)
+
+    @staticmethod
+    def _is_identifier_header(header_line: str, delimiter: str) -> bool:
+        """True if every header field is a column name (no spaces, sentences or data values)"""
+        names = next(csv.reader([header_line], delimiter=delimiter))
+        return all(CSV_HEADER_NAME.match(name.strip()) for name in names)
+
+    @staticmethod
+    def detect_format(sample_lines: List[str], source_name: str = None) -> str:
+        """
+        Guess 'json', 'syslog', 'csv' or 'generic' from the first lines of a file.
+        Text is only taken as CSV when the file (or archive member) is named
+        .csv/.tsv or its first line is a header of identifiers; prose with a
+        steady number of commas stays generic text.
+        """
+        sample = [ln.strip() for ln in sample_lines[:10]]
+
+        if '\n'.join(sample).strip().startswith('{'):
+            return "json"
+        # Check for syslog format (BSD or RFC5424); SYSLOG_REGEX is anchored, so test per line
+        if any(SYSLOG_REGEX.match(ln) or RFC5424_REGEX.search(ln) for ln in sample):
+            return "syslog"
+        lines = [ln for ln in sample if ln]
+        delimiter = LogParser._csv_delimiter(lines)
+        if delimiter and (LogParser._has_csv_name(source_name)
+                          or LogParser._is_identifier_header(lines[0], delimiter)):
+            return "csv"
+        return "generic"
+
+    @staticmethod
+    def is_evtx(file_path: Path) -> bool:
+        with open(file_path, "rb") as f:
+            return f.read(len(EVTX_MAGIC)) == EVTX_MAGIC
+
+    @staticmethod
+    def iter_file_frames(file_path: Path, chunk_bytes: int = None,
+                         evtx_chunks: Tuple[int, int] = None) -> Iterator[pl.DataFrame]:
+        """
+        Parse one file into a stream of DataFrames of bounded size (one per chunk),
+        each with a source_file column. Compressed files and tar archives are read
+        as streams; the format is detected on the first chunk of each stream.
+        evtx_chunks limits an EVTX file to a [first, last) range of its 64 KB chunks.
+        """
+        file_path = Path(file_path)
+
+        if LogParser.is_evtx(file_path) or file_path.suffix.lower() == '.evtx':
+            for df in evtx_reader.iter_frames(file_path, *(evtx_chunks or ())):
+                yield df.with_columns(pl.lit(str(file_path)).alias("source_file"))
+            return
+
+        for source_name, stream in LogParser.open_log_streams(file_path):
+            for df in LogParser._iter_text_frames(stream, chunk_bytes, source_name):
+                if not df.is_empty():
+                    yield df.with_columns(pl.lit(source_name).alias("source_file"))
+
+    @staticmethod
+    def _iter_text_frames(stream: BinaryIO, chunk_bytes: int = None,
+                          source_name: str = None) -> Iterator[pl.DataFrame]:
+        parse = None
+        batches = LogParser.iter_line_batches(stream, chunk_bytes)
+
+        for lines in batches:
+            if parse is None:
+                log_format = LogParser.detect_format(lines, source_name)
+                if log_format == "csv":
+                    # CSV keeps state across batches (header, schema)
+                    yield from LogParser.iter_csv_frames(itertools.chain([lines], batches))
+                    return
+                parse = {
+                    "json": LogParser.parse_json_logs,
+                    "syslog": LogParser.parse_syslog_lines,
+                    "generic": LogParser.parse_generic_text,
+                }[log_format]
+            yield parse(lines)
 
     @staticmethod
     def parse_from_filepaths(filepaths: List[Path]) -> pl.DataFrame:
         all_dfs = []
         for p in filepaths:
             try:
-                if p.suffix.lower() == '.evtx':
-                    df = LogParser.parse_evtx_logs(p)
-                else:
-                    text = p.read_text(errors='ignore').splitlines()
-                    sample = '\n'.join(text[:10])
-
-                    if sample.strip().startswith('{'):
-                        df = LogParser.parse_json_logs(text)
-                    # Check for syslog format (BSD or RFC5424)
-                    elif SYSLOG_REGEX.search(sample) or RFC5424_REGEX.search(sample):
-                        df = LogParser.parse_syslog_lines(text)
-                    else:
-                        df = LogParser.parse_generic_text(text)
-                
-                if not df.is_empty():
-                    df = df.with_columns(pl.lit(str(p)).alias("source_file"))
-                    all_dfs.append(df)
+                all_dfs.extend(LogParser.iter_file_frames(p))
             except Exception as e:
                 print(f"[parser] failed parsing {p}: {e}")
                 continue
@@ -225,4 +860,5 @@ class LogParser:
         if not all_dfs:
             return pl.DataFrame([])
 
-        return pl.concat(all_dfs, how="vertical", rechunk=True)
\ No newline at end of file
+        # JSON frames carry an attributes column the other formats lack
+        return pl.concat(all_dfs, how="diagonal", rechunk=True)
@@ -1,8 +1,10 @@
 from pathlib import Path
 from datetime import datetime
 import pandas as pd
+import polars as pl
+import pyarrow as pa
 import json
-from typing import Dict, List
+from typing import Dict, Iterable, List
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.units import inch
@@ -40,6 +42,24 @@ class ReportGenerator:
         
         return output_path
     
+    def generate_csv_report_from_batches(self, batches: Iterable[pa.RecordBatch], filename: str = None) -> Path:
+        """
+        Generate CSV report from Arrow record batches (see StorageService.query_logs_streaming)
+        
+        Each batch is appended as it arrives, so memory stays bounded by one batch
+        however many rows the query returns.
+        """
+        if not filename:
+            filename = f"log_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        
+        output_path = self.output_dir / filename
+        
+        with open(output_path, 'wb') as f:
+            for i, batch in enumerate(batches):
+                pl.from_arrow(batch).write_csv(f, include_header=(i == 0))
+        
+        return output_path
+    
     def generate_json_report(self, data: Dict, filename: str = None) -> Path:
         """Generate JSON report"""
         if not filename:
@@ -165,6 +185,7 @@ class ReportGenerator:
 
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import FileResponse
+import asyncio
 from services.report_service import ReportGenerator
 from services.storage_service import StorageService
 from config import DATA_DIR
@@ -173,23 +194,15 @@ router = APIRouter()
 report_gen = ReportGenerator(output_dir=DATA_DIR / "reports")
 
 @router.get("/export/csv")
-async def export_csv_report(query: str = "SELECT * FROM logs WHERE is_anomaly = TRUE"):
-    """Export query results to CSV"""
+async def export_csv_report(
+    query: str = "SELECT timestamp, host, message, anomaly_score FROM logs WHERE is_anomaly = TRUE"
+):
+    """Export query results to CSV, streamed from DuckDB in Arrow record batches"""
     try:
-        result = StorageService.query_logs(query)
-        
-        # Convert to list of dicts
-        data = [
-            {
-                "timestamp": row[0],
-                "host": row[1],
-                "message": row[2],
-                "anomaly_score": row[3]
-            }
-            for row in result
-        ]
-        
-        csv_path = report_gen.generate_csv_report(data)
+        csv_path = await asyncio.to_thread(
+            report_gen.generate_csv_report_from_batches,
+            StorageService.query_logs_streaming(query)
+        )
         
         return FileResponse(
             path=str(csv_path),
@@ -1,72 +1,112 @@
-import duckdb
-from config import DB_PATH
-from core.database import get_db_collection
+from config import CONTENT_HASH_AUDIT
+from core.database import db_manager
+from services import evtx_reader
 import polars as pl
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
 import logging
 import hashlib
 
 logger = logging.getLogger(__name__)
 
+# Target amount of staged Arrow data per INSERT statement when no batch size is given
+INSERT_CHUNK_BYTES = 256 * 1024 * 1024
+
+# Fixed seeds for the two 64-bit halves of the native content hash. Polars only
+# guarantees hash stability within one release (polars is pinned in requirements.txt);
+# after an upgrade run StorageService.backfill_content_hashes(rehash=True)
+CONTENT_HASH_SEEDS = (0x51ED2701, 0x7F4A7C15)
+
 class StorageService:
     """
     Service for storing and querying logs in DuckDB.
     Implements proper connection pooling and error handling.
     """
     
-    _connection = None  # Singleton connection
-
     @staticmethod
     @contextmanager
     def get_connection():
-        """Context manager for database connections with proper cleanup"""
+        """
+        Read cursor on the process-wide database connection.
+        No connection is opened and no DDL runs per call; the cursor is closed afterwards.
+        """
         conn = None
         try:
-            conn = get_db_collection()
+            conn = db_manager.cursor()
             yield conn
         except Exception as e:
             logger.error(f"Database connection error: {e}")
-            if conn:
-                conn.rollback()
             raise
         finally:
             if conn:
                 try:
                     conn.close()
                 except Exception as e:
-                    logger.warning(f"Error closing connection: {e}")
+                    logger.warning(f"Error closing cursor: {e}")
+
+    @staticmethod
+    @contextmanager
+    def get_write_connection():
+        """
+        The single writer connection; writes from all requests and background
+        tasks are serialized through its lock.
+        """
+        with db_manager.writer() as conn:
+            try:
+                yield conn
+            except Exception as e:
+                logger.error(f"Database write error: {e}")
+                StorageService._rollback(conn)
+                raise
+
+    @staticmethod
+    def _rollback(conn):
+        """Roll back an open transaction, ignoring 'no transaction is active'"""
+        try:
+            conn.rollback()
+        except Exception:
+            pass
 
     @staticmethod
-    def insert_polars_df(df: pl.DataFrame, table_name: str = "logs", batch_size: int = 1000):
+    def add_content_hash(df: pl.DataFrame) -> pl.DataFrame:
+        """
+        Add the 128-bit dedup key as two UInt64 columns (content_hash_hi / _lo),
+        computed by Polars' native multi-threaded hash kernel over 'raw'.
+        Empty or missing raw lines get no key, so they are never deduplicated.
+        The sha256 hex digest is only added when CONTENT_HASH_AUDIT is enabled.
+        """
+        raw = pl.col('raw')
+        missing = raw.is_null() | (raw == '')
+        hi_seed, lo_seed = CONTENT_HASH_SEEDS
+        columns = [
+            pl.when(missing).then(None).otherwise(raw.hash(hi_seed)).alias('content_hash_hi'),
+            pl.when(missing).then(None).otherwise(raw.hash(lo_seed)).alias('content_hash_lo'),
+        ]
+        if CONTENT_HASH_AUDIT:
+            columns.append(
+                raw.map_elements(lambda x: hashlib.sha256(x.encode('utf-8', 'ignore')).hexdigest() if x else None,
+                          return_dtype=pl.Utf8).alias('content_hash')
+            )
+        return df.with_columns(columns)
+
+    @staticmethod
+    def insert_polars_df(df: pl.DataFrame, table_name: str = "logs", batch_size: int = None):
         """
         Optimized batch insertion with deduplication and proper error handling.
+        The frame's Arrow buffers are handed to DuckDB directly (no pandas copy).
         
         Args:
             df: Polars DataFrame with log data
             table_name: Target table name (default: 'logs')
-            batch_size: Number of rows per batch (default: 1000)
+            batch_size: Rows per INSERT statement (default: sized adaptively so
+                each statement stages about INSERT_CHUNK_BYTES of data)
         """
-        with StorageService.get_connection() as conn:
+        with StorageService.get_write_connection() as conn:
             try:
-                # 1. Add content hash for deduplication
-                df = df.with_columns(
-                    pl.col('raw').apply(lambda x: hashlib.sha256(x.encode('utf-8', 'ignore')).hexdigest() if x else None).alias('content_hash')
-                )
-
-                # 2. Get existing hashes
-                existing_hashes = {row[0] for row in conn.execute("SELECT content_hash FROM logs WHERE content_hash IS NOT NULL").fetchall()}
-                
-                # 3. Filter out duplicates
-                original_row_count = len(df)
-                df = df.filter(~pl.col('content_hash').is_in(existing_hashes))
-                new_row_count = len(df)
-                logger.info(f"Deduplication: {original_row_count - new_row_count} duplicate logs removed.")
-
-                if new_row_count == 0:
-                    logger.info("✅ No new logs to insert.")
-                    return 0
+                # 1. Add content hash for deduplication (workers may have added it already)
+                if 'content_hash_hi' not in df.columns:
+                    df = StorageService.add_content_hash(df)
 
-                # 4. Ensure required columns exist
+                # 2. Ensure required columns exist
                 required_columns = {
                     'timestamp': pl.Datetime(time_unit='ms'),
                     'host': pl.Utf8,
@@ -79,7 +119,11 @@ class StorageService:
                     'severity': pl.Utf8,
                     'detections': pl.Utf8,
                     'ttp_tags': pl.Utf8,
-                    'content_hash': pl.Utf8
+                    'content_hash': pl.Utf8,
+                    'content_hash_hi': pl.UInt64,
+                    'content_hash_lo': pl.UInt64,
+                    'attributes': pl.Utf8,
+                    'event_id': pl.Int64
                 }
                 
                 for col_name, col_type in required_columns.items():
@@ -88,23 +132,59 @@ class StorageService:
 
                 # Reorder columns to match table schema
                 df = df.select(list(required_columns.keys()))
+                columns = ", ".join(required_columns.keys())
 
-                # 5. Batch insert
-                df_pandas = df.to_pandas()
-                total_rows = len(df_pandas)
+                # 3. Insert straight from Arrow, deduplicated inside DuckDB: rows repeated
+                # within the batch are collapsed and rows whose hash is already stored are
+                # skipped by the unique index on the hash pair (ON CONFLICT DO NOTHING)
+                total_rows = len(df)
+                if not batch_size:
+                    bytes_per_row = max(df.estimated_size() // max(total_rows, 1), 1)
+                    batch_size = max(INSERT_CHUNK_BYTES // bytes_per_row, 10_000)
                 inserted_rows = 0
                 
-                for i in range(0, total_rows, batch_size):
-                    batch = df_pandas.iloc[i:i + batch_size]
+                for offset in range(0, total_rows, batch_size):
+                    staged = df.slice(offset, batch_size).with_row_count('_row')
+                    conn.register("staged_logs", staged.to_arrow())
                     try:
-                        conn.unregister("batch_df")
-                    except Exception:
-                        pass
-                    conn.register("batch_df", batch)
-                    conn.execute(f"INSERT INTO {table_name} SELECT * FROM batch_df")
-                    inserted_rows += len(batch)
-                    logger.info(f"Inserted {inserted_rows}/{total_rows} rows")
+                        # ids follow input order: the surviving rows are sorted by their
+                        # position in the frame before nextval() numbers them (rows skipped
+                        # as already stored leave gaps, ids stay monotonic)
+                        conn.execute(f"""
+                            CREATE OR REPLACE TEMP TABLE numbered_logs AS
+                            SELECT nextval('logs_id_seq') AS id, {columns}
+                            FROM (
+                                SELECT * FROM (
+                                    SELECT *, row_number() OVER (
+                                        PARTITION BY content_hash_hi, content_hash_lo ORDER BY _row
+                                    ) AS _dup
+                                    FROM staged_logs
+                                ) AS staged
+                                WHERE staged.content_hash_hi IS NULL OR staged._dup = 1
+                                ORDER BY _row
+                            )
+                        """)
+                        inserted_rows += conn.execute(f"""
+                            INSERT INTO {table_name} (id, {columns})
+                            SELECT id, {columns} FROM numbered_logs WHERE content_hash_hi IS NOT NULL
+                            ON CONFLICT (content_hash_hi, content_hash_lo) DO NOTHING
+                        """).fetchone()[0]
+                        # Rows without a hash are never deduplicated; DuckDB would treat
+                        # several of them in one ON CONFLICT statement as conflicting
+                        inserted_rows += conn.execute(f"""
+                            INSERT INTO {table_name} (id, {columns})
+                            SELECT id, {columns} FROM numbered_logs WHERE content_hash_hi IS NULL
+                        """).fetchone()[0]
+                    finally:
+                        conn.unregister("staged_logs")
+                        conn.execute("DROP TABLE IF EXISTS numbered_logs")
+                
+                logger.info(f"Deduplication: {total_rows - inserted_rows} duplicate logs removed.")
                 
+                if inserted_rows == 0:
+                    logger.info("✅ No new logs to insert.")
+                    return 0
+
                 conn.execute("CHECKPOINT")
                 logger.info(f"✅ Successfully stored {inserted_rows} new rows in {table_name}")
                 
@@ -112,9 +192,215 @@ class StorageService:
 
             except Exception as e:
                 logger.error(f"❌ Insert failed: {e}")
-                conn.rollback()
                 raise
 
+    @staticmethod
+    def backfill_content_hashes(rehash: bool = False, batch_size: int = 100_000, stop=None) -> int:
+        """
+        Compute the native content hash for rows stored before it existed
+        (or for every row when rehash=True, e.g. after a Polars upgrade).
+        Returns the number of rows updated.
+        The writer is taken per batch, so inserts are not blocked for the whole
+        table; a rehash holds it throughout (the lock is re-entrant), since no
+        insert may dedup against keys that are cleared but not yet recomputed.
+        Setting the optional stop event ends the backfill after the current batch.
+        """
+        where = "raw IS NOT NULL AND raw <> ''"
+        if not rehash:
+            where += " AND content_hash_hi IS NULL"
+        updated = 0
+        last_id = 0
+
+        with db_manager.write_lock if rehash else nullcontext():
+            if rehash:
+                # Cleared first so rows hashed in earlier batches cannot collide with stale keys
+                with StorageService.get_write_connection() as conn:
+                    conn.execute("UPDATE logs SET content_hash_hi = NULL, content_hash_lo = NULL")
+            while not (stop and stop.is_set()):
+                with StorageService.get_connection() as conn:
+                    batch = conn.execute(
+                        f"SELECT id, raw FROM logs WHERE {where} AND id > ? ORDER BY id LIMIT ?",
+                        [last_id, batch_size]
+                    ).pl()
+                if batch.is_empty():
+                    break
+                last_id = batch['id'][-1]
+
+                hashed = StorageService.add_content_hash(batch.select(['id', 'raw']))
+                with StorageService.get_write_connection() as conn:
+                    conn.register("staged_hashes", hashed.select(['id', 'content_hash_hi', 'content_hash_lo']).to_arrow())
+                    try:
+                        conn.execute("""
+                            UPDATE logs SET content_hash_hi = staged_hashes.content_hash_hi,
+                                            content_hash_lo = staged_hashes.content_hash_lo
+                            FROM staged_hashes WHERE logs.id = staged_hashes.id
+                        """)
+                    finally:
+                        conn.unregister("staged_hashes")
+                updated += len(batch)
+
+        if updated:
+            logger.info(f"🔑 Computed native content hashes for {updated} stored logs")
+        return updated
+
+    @staticmethod
+    def migrate_evtx_raw(batch_size: int = 10_000, stop=None) -> int:
+        """
+        Convert the raw text of EVTX events stored as XML by older versions to the
+        canonical form the EVTX reader stores now, and rehash them, so re-importing
+        those files deduplicates against them. Rows whose converted hash is already
+        stored (the same event imported again after the upgrade) are deleted.
+        Returns the number of rows migrated; the optional stop event ends the
+        migration after the current batch.
+        Irreversible (the original record XML is replaced), so it never runs on its
+        own: see scripts/migrate_evtx_raw.py, which is meant to be run after a backup.
+        """
+        where = "process LIKE 'EventID_%' AND raw LIKE '<Event%'"
+        migrated = 0
+        last_id = 0
+
+        while not (stop and stop.is_set()):
+            with StorageService.get_connection() as conn:
+                batch = conn.execute(
+                    f"SELECT id, raw FROM logs WHERE {where} AND id > ? ORDER BY id LIMIT ?",
+                    [last_id, batch_size]
+                ).pl()
+            if batch.is_empty():
+                break
+            last_id = batch['id'][-1]
+
+            converted = batch.with_columns(
+                pl.col('raw').map_elements(evtx_reader.raw_from_xml, return_dtype=pl.Utf8)
+            ).filter(pl.col('raw').is_not_null())
+            hashed = StorageService.add_content_hash(converted).select(['id', 'raw', 'content_hash_hi', 'content_hash_lo'])
+
+            with StorageService.get_write_connection() as conn:
+                conn.register("staged_raw", hashed.to_arrow())
+                try:
+                    # Duplicates (of stored rows or within the batch) go first, so the
+                    # update below cannot violate the unique hash index
+                    conn.execute("""
+                        DELETE FROM logs WHERE id IN (
+                            SELECT staged.id FROM staged_raw staged
+                            WHERE EXISTS (
+                                SELECT 1 FROM logs existing
+                                WHERE existing.content_hash_hi = staged.content_hash_hi
+                                  AND existing.content_hash_lo = staged.content_hash_lo
+                                  AND existing.id <> staged.id
+                            ) OR EXISTS (
+                                SELECT 1 FROM staged_raw earlier
+                                WHERE earlier.content_hash_hi = staged.content_hash_hi
+                                  AND earlier.content_hash_lo = staged.content_hash_lo
+                                  AND earlier.id < staged.id
+                            )
+                        )
+                    """)
+                    conn.execute("""
+                        UPDATE logs SET raw = staged_raw.raw,
+                                        content_hash_hi = staged_raw.content_hash_hi,
+                                        content_hash_lo = staged_raw.content_hash_lo
+                        FROM staged_raw WHERE logs.id = staged_raw.id
+                    """)
+                finally:
+                    conn.unregister("staged_raw")
+            migrated += len(hashed)
+
+        if migrated:
+            logger.info(f"🔑 Migrated raw text of {migrated} stored EVTX events")
+        return migrated
+
+    @staticmethod
+    def apply_analysis_results(results: pl.DataFrame, scope: str = None, detection_version: str = None):
+        """
+        Write a chunk of analysis results with one set-based UPDATE.
+        
+        Args:
+            results: Frame with id, is_anomaly, anomaly_score, severity, detections,
+                ttp_tags (null values keep the stored column value)
+            scope: Analysis scope whose watermark advances to the chunk's max id in
+                the same transaction (requires detection_version)
+            detection_version: Detection content version the results were scored with
+        """
+        if results.is_empty():
+            return 0
+
+        with StorageService.get_write_connection() as conn:
+            conn.register("staged_results", results.to_arrow())
+            try:
+                conn.execute("BEGIN TRANSACTION")
+                conn.execute("""
+                    UPDATE logs SET
+                        is_anomaly = COALESCE(staged_results.is_anomaly, logs.is_anomaly),
+                        anomaly_score = COALESCE(staged_results.anomaly_score, logs.anomaly_score),
+                        severity = COALESCE(staged_results.severity, logs.severity),
+                        detections = staged_results.detections,
+                        ttp_tags = staged_results.ttp_tags
+                    FROM staged_results
+                    WHERE logs.id = staged_results.id
+                """)
+                if detection_version:
+                    StorageService._write_watermark(conn, scope, detection_version, int(results['id'].max()))
+                conn.execute("COMMIT")
+            finally:
+                conn.unregister("staged_results")
+
+        return len(results)
+
+    @staticmethod
+    def _write_watermark(conn, scope: str, detection_version: str, last_seq: int):
+        conn.execute(
+            "INSERT OR REPLACE INTO analysis_watermarks VALUES (?, ?, ?, current_timestamp)",
+            (scope or '', detection_version, last_seq)
+        )
+
+    @staticmethod
+    def save_watermark(scope: str, detection_version: str, last_seq: int):
+        with StorageService.get_write_connection() as conn:
+            StorageService._write_watermark(conn, scope, detection_version, last_seq)
+
+    @staticmethod
+    def get_watermark(scope: str, detection_version: str):
+        """Highest log id analyzed for this scope with this detection version, or None"""
+        rows = StorageService.query_logs(
+            "SELECT last_seq FROM analysis_watermarks WHERE scope = ? AND detection_version = ?",
+            (scope or '', detection_version)
+        )
+        return rows[0][0] if rows else None
+
+    @staticmethod
+    def initial_watermark(scope: str, scope_filter: str = "", scope_params: tuple = ()):
+        """
+        Starting point for a detection version that has no watermark yet.
+        A new version inherits the scope's most recent watermark, so after a rule or
+        model update only rows ingested since are scored (older rows can be rescored
+        by time window). A scope that was never analyzed starts just before its
+        first unanalyzed row.
+        """
+        rows = StorageService.query_logs(
+            "SELECT last_seq FROM analysis_watermarks WHERE scope = ? ORDER BY updated_at DESC LIMIT 1",
+            (scope or '',)
+        )
+        if rows:
+            return rows[0][0]
+
+        return StorageService.query_logs(
+            f"""
+            SELECT COALESCE(MIN(id) FILTER (WHERE detections IS NULL) - 1, MAX(id), 0)
+            FROM logs WHERE TRUE {scope_filter}
+            """,
+            scope_params
+        )[0][0]
+
+    @staticmethod
+    def list_watermarks():
+        rows = StorageService.query_logs(
+            "SELECT scope, detection_version, last_seq, updated_at FROM analysis_watermarks ORDER BY updated_at DESC"
+        )
+        return [
+            {'scope': scope or None, 'detection_version': version, 'last_seq': last_seq, 'updated_at': updated_at}
+            for scope, version, last_seq, updated_at in rows
+        ]
+
     @staticmethod
     def query_logs(query: str, params: tuple = None):
         """
@@ -167,16 +453,20 @@ class StorageService:
                 return {}
 
     @staticmethod
-    def query_logs_streaming(query: str, batch_size: int = 1000):
-        """Stream results for large datasets"""
+    def query_logs_streaming(query: str, params: tuple = None, batch_size: int = 100_000):
+        """
+        Stream results for large datasets.
+        The query runs once and DuckDB hands back pyarrow RecordBatches of up to
+        batch_size rows, so every batch costs the same and concurrent inserts
+        cannot shift rows between pages. Convert with pl.from_arrow(batch) if needed.
+        """
         with StorageService.get_connection() as conn:
-            offset = 0
-            while True:
-                batch_query = f"{query} LIMIT {batch_size} OFFSET {offset}"
-                results = conn.execute(batch_query).fetchall()
-                
-                if not results:
-                    break
-                
-                yield results
-                offset += batch_size
\ No newline at end of file
+            if params:
+                conn.execute(query, params)
+            else:
+                conn.execute(query)
+            reader = conn.fetch_record_batch(batch_size)
+
+            for batch in reader:
+                if batch.num_rows:
+                    yield batch
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { motion } from 'framer-motion';
 import { Search, Filter } from 'lucide-react';
 import toast from 'react-hot-toast';
@@ -7,7 +7,7 @@ import { Input } from '../components/ui/input';
 import { Select } from '../components/ui/select';
 import { Card, CardContent } from '../components/ui/card';
 import ThreatCard from '../components/threats/ThreatCard';
-import { runAnalysis } from '../utils/api';
+import { runAnalysis, subscribeToJob, getAnalysisJob } from '../utils/api';
 import { mockThreats } from '../data/mockData';
 
 const ThreatAnalysis = ({ apiBaseUrl }) => {
@@ -16,20 +16,57 @@ const ThreatAnalysis = ({ apiBaseUrl }) => {
   const [filterSeverity, setFilterSeverity] = useState('all');
   const [filterType, setFilterType] = useState('all');
   const [searchTerm, setSearchTerm] = useState('');
+  const jobEvents = useRef(null);
+
+  // Stop following the job when the page is left
+  useEffect(() => () => jobEvents.current?.close(), []);
+
+  const handleJobFinished = async (jobId, loadingToast) => {
+    try {
+      const job = await getAnalysisJob(apiBaseUrl, jobId);
+      if (job.status !== 'completed') {
+        toast.error(job.message || job.detail || 'Analysis failed', { id: loadingToast });
+        return;
+      }
+      const topThreats = job.details?.top_threats;
+      if (topThreats) {
+        setThreats(topThreats);
+      }
+      toast.success(`Analysis complete: ${job.threats_found} threats found`, { id: loadingToast });
+    } catch (error) {
+      console.error('Fetching analysis result failed:', error);
+      toast.error('Analysis failed', { id: loadingToast });
+    } finally {
+      setLoading(false);
+    }
+  };
 
   const handleRunAnalysis = async () => {
     setLoading(true);
     const loadingToast = toast.loading('Running threat analysis...');
     try {
       const result = await runAnalysis(apiBaseUrl);
-      if (result.top_threats) {
-        setThreats(result.top_threats);
-        toast.success(`Analysis complete: ${result.top_threats.length} threats found`, { id: loadingToast });
+      if (!result.job_id) {
+        throw new Error(result.detail || 'No analysis job started');
       }
+      jobEvents.current?.close();
+      jobEvents.current = subscribeToJob(apiBaseUrl, result.job_id, (job) => {
+        if (job.status === 'completed' || job.status === 'failed') {
+          handleJobFinished(result.job_id, loadingToast);
+        } else {
+          toast.loading(`${job.message} (${Math.round(job.progress)}%)`, { id: loadingToast });
+        }
+      });
+      jobEvents.current.onerror = (event) => {
+        // Dropped connections are retried by the browser; CLOSED means the server
+        // refused the stream (e.g. the job is gone), so report what the job API says
+        if (event.target.readyState === EventSource.CLOSED) {
+          handleJobFinished(result.job_id, loadingToast);
+        }
+      };
     } catch (error) {
       console.error('Analysis failed:', error);
       toast.error('Analysis failed', { id: loadingToast });
-    } finally {
       setLoading(false);
     }
   };
@@ -104,13 +104,38 @@ export const clearTemp = async (apiBaseUrl) => {
 /**
  * Analysis endpoints
  */
+/**
+ * Start a background analysis job; resolves to { status, job_id, ... }
+ * Follow it with subscribeToJob and read the result with getAnalysisJob
+ */
 export const runAnalysis = async (apiBaseUrl) => {
-  const response = await fetch(`${apiBaseUrl}/analysis/comprehensive`, {
+  const response = await fetch(`${apiBaseUrl}/analysis/analyze/comprehensive`, {
     method: 'POST'
   });
   return response.json();
 };
 
+export const getAnalysisJob = async (apiBaseUrl, jobId) => {
+  const response = await fetch(`${apiBaseUrl}/analysis/jobs/${jobId}`);
+  return response.json();
+};
+
+/**
+ * Follow a background job over Server-Sent Events.
+ * Returns the EventSource; call close() on it to stop listening early.
+ */
+export const subscribeToJob = (apiBaseUrl, jobId, onProgress) => {
+  const source = new EventSource(`${apiBaseUrl}/analysis/jobs/${jobId}/events`);
+  source.addEventListener('progress', (event) => {
+    const job = JSON.parse(event.data);
+    onProgress(job);
+    if (job.status === 'completed' || job.status === 'failed') {
+      source.close();
+    }
+  });
+  return source;
+};
+
 /**
  * SOUP endpoints
  */